@@ -1,37 +1,59 @@
-from abc import ABCMeta, abstractmethod
 from stmt import Function
-from environment import Environment
+from environment import Environment, MISSING
+from error import RuntimeError
+from numeric import NumericCompiler
 from tokens import Token
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 
-class ReturnBubble(Exception):
-    def __init__(self, value):
-        self.value = value
+# control flow signals left on the interpreter by return and break
+# statements, checked after each statement instead of unwinding with
+# exceptions
+NO_SIGNAL = 0
+RETURN = 1
+BREAK = 2
 
 
-class HootCallable(metaclass=ABCMeta):
-    @abstractmethod
-    def call(self, interpreter, arguments: List, error_token: Token): pass
+class HootCallable:
+    __slots__ = ()
 
-    @abstractmethod
-    def arity(self, interpreter, arguments: List): pass
+    def call(self, interpreter, arguments: List, error_token: Token):
+        raise NotImplementedError
+
+    def arity(self, interpreter, arguments: List):
+        raise NotImplementedError
 
 
 class HootInstance:
+    __slots__ = ('klass', 'fields', '_bound')
+
     def __init__(self, klass):
         self.klass = klass
         self.fields = {}
+        # methods already bound to this instance, made on first access
+        self._bound: Optional[Dict] = None
 
     def get(self, name: Token):
-        if name.lexeme in self.fields:
-            return self.fields[name.lexeme]
+        value = self.fields.get(name.lexeme, MISSING)
+        if value is not MISSING:
+            return value
 
         method = self.klass.find_method(name.lexeme)
         if method != None:
-            return method.bind(self)
+            return self.bind(method)
         raise RuntimeError(name, f"Undefined property '{name.lexeme}'.")
 
+    def bind(self, method):
+        # keyed by the method rather than its name so a superclass method
+        # doesn't collide with the override of the same name
+        if self._bound is None:
+            self._bound = {}
+        bound = self._bound.get(method)
+        if bound == None:
+            bound = method.bind(self)
+            self._bound[method] = bound
+        return bound
+
     def set_(self, name: Token, value):
         self.fields[name.lexeme] = value
 
@@ -40,16 +62,23 @@ class HootInstance:
 
 
 class HootClass(HootCallable):
+    __slots__ = ('superclass', 'name', 'methods', '_mro')
+
     def __init__(self, name, superclass, methods: Dict):
         self.superclass = superclass
         self.name = name
         self.methods = methods
+        # method tables from this class up to the root, searched in order
+        self._mro: List[Dict] = [methods]
+        if superclass != None:
+            self._mro += superclass._mro
 
     def find_method(self, name: str):
-        if name in self.methods:
-            return self.methods[name]
-        if self.superclass != None:
-            return self.superclass.find_method(name)
+        for methods in self._mro:
+            method = methods.get(name)
+            if method != None:
+                return method
+        return None
 
     def call(self, interpreter, arguments: List, error_token: Token):
         instance = HootInstance(self)
@@ -70,6 +99,8 @@ class HootClass(HootCallable):
 
 
 class HootFunction(HootCallable):
+    __slots__ = ('declaration', 'closure', 'is_initializer')
+
     def __init__(self, declaration: Function, closure: Environment, is_initializer: bool):
         self.declaration = declaration
         self.closure = closure
@@ -84,19 +115,32 @@ class HootFunction(HootCallable):
         return len(self.declaration.params)
 
     def call(self, interpreter, arguments: List, error_token: Token):
+        declaration = self.declaration
+        if declaration._numeric == None:
+            declaration._numeric = NumericCompiler(declaration).compile() or False
+        # the compiled version assumes every parameter is a number
+        if declaration._numeric and not self.is_initializer \
+                and len(arguments) == len(declaration.params) \
+                and all(type(argument) == float for argument in arguments):
+            return declaration._numeric(*arguments)
+
         environment = Environment(self.closure)
-        for idx, param in enumerate(self.declaration.params):
+        for idx, param in enumerate(declaration.params):
             environment.define(param.lexeme, arguments[idx])
 
-        try:
-            interpreter.execute_block(self.declaration.body, environment)
-        except ReturnBubble as return_value:
-            if self.is_initializer:
-                return self.closure.get_at(0, "this")
-            return return_value.value
+        if declaration._code == None:
+            declaration._code = interpreter.compile(declaration.body)
+        interpreter.execute_block(declaration._code, environment)
+
+        value = None
+        if interpreter.signal == RETURN:
+            value = interpreter.return_value
+            interpreter.signal = NO_SIGNAL
+            interpreter.return_value = None
 
         if self.is_initializer:
-            return self.closure.get_at(0, "this")
+            return self.closure.get_slot(0, 0)
+        return value
 
     def __repr__(self):
         return f"<fn {self.declaration.name.lexeme}>"
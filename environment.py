@@ -1,40 +1,75 @@
-from tokens import Token
 from error import RuntimeError
+from typing import Dict
+
+# returned by dict.get when a key is absent, so a lookup is a single probe
+MISSING = object()
 
 
 class Environment:
+    __slots__ = ('enclosing', 'ancestors', 'slots')
+
     def __init__(self, enclosing):
         self.enclosing = enclosing
-        self.values = {}
+        # every enclosing environment, nearest first, so a resolved
+        # distance is a single index rather than a walk up the chain.
+        # self isn't included as that would make each environment a cycle
+        self.ancestors = () if enclosing == None else (
+            (enclosing,) + enclosing.ancestors)
+        # a list indexed by the slot the resolver gave each declaration
+        self.slots = []
 
     def define(self, name, value):
-        self.values[name] = value
+        self.slots.append(value)
+
+    def get_slot(self, distance: int, slot: int):
+        if distance == 0:
+            return self.slots[slot]
+        return self.ancestors[distance - 1].slots[slot]
+
+    def set_slot(self, distance: int, slot: int, value):
+        if distance == 0:
+            self.slots[slot] = value
+        else:
+            self.ancestors[distance - 1].slots[slot] = value
 
-    def ancestor(self, distance: int):
-        environment = self
-        for _ in range(0, distance):
-            environment = environment.enclosing
-        return environment
 
-    def get_at(self, distance: int, name: str):
-        return self.ancestor(distance).values.get(name)
+class GlobalEnvironment(Environment):
+    __slots__ = ('values', 'version', 'builtin_slots')
 
-    def assign_at(self, distance: int, name: Token, value):
-        self.ancestor(distance).values[name.lexeme] = value
+    def __init__(self, builtins: Dict):
+        super().__init__(None)
+        # the global scope is looked up by name because it's patched at
+        # runtime (natives, the REPL)
+        self.values: Dict = {}
+        # bumped whenever values changes so lookups can be cached
+        self.version = 0
+        # builtins also live in slots so the resolver can point reads of
+        # them straight at an index. Rebinding one of their names writes
+        # through so the slot always matches the global
+        self.builtin_slots: Dict[str, int] = {}
+        for name, value in builtins.items():
+            self.builtin_slots[name] = len(self.slots)
+            self.slots.append(value)
+            self.define(name, value)
+
+    def define(self, name, value):
+        self.values[name] = value
+        self.version += 1
+        slot = self.builtin_slots.get(name)
+        if slot != None:
+            self.slots[slot] = value
 
     def get(self, name):
-        if name.lexeme in self.values:
-            return self.values[name.lexeme]
-        if self.enclosing != None:
-            return self.enclosing.get(name)
+        value = self.values.get(name.lexeme, MISSING)
+        if value is not MISSING:
+            return value
         raise RuntimeError(name, f"Undefined variable '{name.lexeme}'.")
 
     def assign(self, name, value):
-        if name.lexeme in self.values:
-            self.values[name.lexeme] = value
-            return
-
-        if self.enclosing != None:
-            self.enclosing.assign(name, value)
-            return
-        raise RuntimeError(name, f"Undefined variable '{name.lexeme}'.")
+        if not name.lexeme in self.values:
+            raise RuntimeError(name, f"Undefined variable '{name.lexeme}'.")
+        self.values[name.lexeme] = value
+        self.version += 1
+        slot = self.builtin_slots.get(name.lexeme)
+        if slot != None:
+            self.slots[slot] = value
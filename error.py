@@ -2,15 +2,17 @@ from tokens import Token
 
 
 class ParseError(Exception):
-    def __init__(self, message: str):
+    def __init__(self, token: Token, message: str):
+        self.token = token
         self.message = message
 
+    def __str__(self):
+        # the parser catches these to synchronize and never shows them, so
+        # the token is only formatted if something does print one
+        return f'{self.token} {self.message}'
+
 
 class RuntimeError(Exception):
     def __init__(self, token: Token, message: str):
         self.token = token
         self.message = message
-
-
-class BreakJump(RuntimeError):
-    pass
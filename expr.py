@@ -1,154 +1,129 @@
-from abc import ABCMeta, abstractmethod
 from tokens import Token
-from typing import List, Union
+from typing import Any, List, Tuple, Union
 
 
-class ExprVisitor(metaclass=ABCMeta):
-    @abstractmethod
-    def visit_assign_expr(self, expr): pass
-
-    @abstractmethod
-    def visit_binary_expr(self, expr): pass
-
-    @abstractmethod
-    def visit_call_expr(self, expr): pass
-
-    @abstractmethod
-    def visit_grouping_expr(self, expr): pass
-
-    @abstractmethod
-    def visit_get_expr(self, expr): pass
-
-    @abstractmethod
-    def visit_literal_expr(self, expr): pass
-
-    @abstractmethod
-    def visit_logical_expr(self, expr): pass
-
-    @abstractmethod
-    def visit_set_expr(self, expr): pass
-
-    @abstractmethod
-    def visit_super_expr(self, expr): pass
-
-    @abstractmethod
-    def visit_this_expr(self, expr): pass
-
-    @abstractmethod
-    def visit_unary_expr(self, expr): pass
-
-    @abstractmethod
-    def visit_variable_expr(self, expr): pass
-
-
-class Expr(metaclass=ABCMeta):
-    @abstractmethod
-    def accept(self, visitor: ExprVisitor): pass
+class Expr:
+    __slots__ = ()
 
 
 class Assign(Expr):
+    __slots__ = ('name', 'value', '_resolved_distance', '_resolved_slot')
+
     def __init__(self, name: Token, value: Expr):
         self.name = name
         self.value = value
-
-    def accept(self, visitor: ExprVisitor):
-        return visitor.visit_assign_expr(self)
+        self._resolved_distance = -1
+        self._resolved_slot = -1
 
 
 class Binary(Expr):
+    __slots__ = ('left', 'operator', 'right', '_operation')
+
     def __init__(self, left: Expr, operator: Token, right: Expr):
         self.left = left
         self.operator = operator
         self.right = right
-
-    def accept(self, visitor: ExprVisitor):
-        return visitor.visit_binary_expr(self)
+        # handler for the operator, filled in on first evaluation
+        self._operation: Any = None
 
 
 class Call(Expr):
+    __slots__ = ('callee', 'paren', 'arguments', '_ic_entries')
+
     def __init__(self, callee: Expr, paren: Token, arguments: List[Expr]):
         self.callee = callee
         self.paren = paren
         self.arguments = arguments
-
-    def accept(self, visitor: ExprVisitor):
-        return visitor.visit_call_expr(self)
+        # polymorphic inline cache of (callee key, arity) pairs
+        self._ic_entries: List[Tuple[object, int]] = []
 
 
 class Get(Expr):
+    __slots__ = ('obj', 'name', '_ic_klass', '_ic_method')
+
     def __init__(self, obj: Expr, name: Token):
         self.obj = obj
         self.name = name
-
-    def accept(self, visitor: ExprVisitor):
-        return visitor.visit_get_expr(self)
+        # inline cache: the last class seen here and its resolved method
+        self._ic_klass: Any = None
+        self._ic_method: Any = None
 
 
 class Grouping(Expr):
+    __slots__ = ('expression',)
+
     def __init__(self, expression: Expr):
         self.expression = expression
 
-    def accept(self, visitor: ExprVisitor):
-        return visitor.visit_grouping_expr(self)
-
 
 class Literal(Expr):
-    def __init__(self, value: Union[str, float, bool]):
-        self.value = value
+    __slots__ = ('value',)
 
-    def accept(self, visitor: ExprVisitor):
-        return visitor.visit_literal_expr(self)
+    def __init__(self, value: Union[str, float, bool, None]):
+        self.value = value
 
 
 class Logical(Expr):
+    __slots__ = ('left', 'operator', 'right')
+
     def __init__(self, left: Expr, operator: Token, right: Expr):
         self.left = left
         self.operator = operator
         self.right = right
 
-    def accept(self, visitor: ExprVisitor):
-        return visitor.visit_logical_expr(self)
-
 
 class Set(Expr):
+    __slots__ = ('obj', 'name', 'value')
+
     def __init__(self, obj, name: Token, value: Expr):
         self.obj = obj
         self.name = name
         self.value = value
 
-    def accept(self, visitor: ExprVisitor):
-        return visitor.visit_set_expr(self)
-
 
 class Super(Expr):
+    __slots__ = ('keyword', 'method', '_resolved_distance', '_resolved_slot',
+                 '_ic_superclass', '_ic_method')
+
     def __init__(self, keyword: Token, method: Token):
         self.keyword = keyword
         self.method = method
-
-    def accept(self, visitor: ExprVisitor):
-        return visitor.visit_super_expr(self)
+        self._resolved_distance = -1
+        self._resolved_slot = -1
+        # inline cache: the last superclass seen here and its method
+        self._ic_superclass: Any = None
+        self._ic_method: Any = None
 
 
 class This(Expr):
+    __slots__ = ('keyword', '_resolved_distance', '_resolved_slot')
+
     def __init__(self, keyword: Token):
         self.keyword = keyword
-
-    def accept(self, visitor: ExprVisitor):
-        return visitor.visit_this_expr(self)
+        self._resolved_distance = -1
+        self._resolved_slot = -1
 
 
 class Unary(Expr):
+    __slots__ = ('operator', 'right')
+
     def __init__(self, operator: Token, right: Expr):
         self.operator = operator
         self.right = right
 
-    def accept(self, visitor: ExprVisitor):
-        return visitor.visit_unary_expr(self)
-
 
 class Letiable(Expr):
+    __slots__ = ('name', '_resolved_distance', '_resolved_slot',
+                 '_builtin_slot', '_cached_version', '_cached_value')
+
     def __init__(self, name: Token):
         self.name = name
+        # scope distance and slot set by the resolver, -1 means global
+        self._resolved_distance = -1
+        self._resolved_slot = -1
+        # slot of the builtin this names, set by the resolver
+        self._builtin_slot = -1
+        # a global's value and the globals version it was read at
+        self._cached_version = -1
+        self._cached_value: Any = None
 
-    def accept(self, visitor: ExprVisitor):
-        return visitor.visit_variable_expr(self)
@@ -1,10 +1,29 @@
 import sys
+import os
+import hashlib
+import pickle
 from error import RuntimeError
-from tokens import TokenType
+from tokens import EOF
 from scanner import Scanner
 from resolver import Resolver
 from interpreter import Interpreter
 
+# resolved programs are pickled here when HOOT_CACHE_DIR is set, keyed by
+# a hash of their source and of the interpreter's own source files
+CACHE_DIR = os.environ.get('HOOT_CACHE_DIR')
+INTERPRETER_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def interpreter_digest():
+    # any change to the AST classes, parser or resolver changes this, so
+    # entries written by another version of Hoot are never loaded
+    digest = hashlib.sha1()
+    for name in sorted(os.listdir(INTERPRETER_DIR)):
+        if name.endswith('.py'):
+            with open(os.path.join(INTERPRETER_DIR, name), 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
 
 class Hoot:
     def __init__(self):
@@ -24,6 +43,11 @@ class Hoot:
             pass
 
     def run(self, source):
+        statements = self.parse(source)
+        if statements != None:
+            self.interpreter.interpret(statements)
+
+    def parse(self, source):
         from parser_ import Parser
         scanner = Scanner(self, source)
         scanner.scan_tokens()
@@ -41,16 +65,56 @@ class Hoot:
         if (self.had_error):
             return
 
-        self.interpreter.interpret(statements)
+        return statements
 
     def run_file(self, path):
         with open(path) as f:
-            self.run(f.read())
-            if self.had_error:
-                return 65
-            if self.had_runtime_error:
-                return 70
-            return 0
+            source = f.read()
+
+        if CACHE_DIR == None:
+            statements = self.parse(source)
+        else:
+            statements = self.parse_cached(source)
+
+        if statements != None:
+            self.interpreter.interpret(statements)
+        if self.had_error:
+            return 65
+        if self.had_runtime_error:
+            return 70
+        return 0
+
+    def parse_cached(self, source):
+        digest = hashlib.sha1(
+            (interpreter_digest() + source).encode()).hexdigest()
+        cache_path = os.path.join(CACHE_DIR, f'{digest}.pkl')
+        statements = self.load_cached(cache_path)
+        if statements == None:
+            statements = self.parse(source)
+            # programs with errors aren't cached so they're reported again
+            if statements != None:
+                self.save_cached(cache_path, statements)
+        return statements
+
+    def load_cached(self, cache_path):
+        # a missing or unreadable entry just means parsing again
+        try:
+            with open(cache_path, 'rb') as f:
+                return pickle.load(f)
+        except Exception:
+            return None
+
+    def save_cached(self, cache_path, statements):
+        # written before interpreting, so the nodes' runtime caches are
+        # still empty. The cache is best-effort and never stops a run
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            temp_path = f'{cache_path}.{os.getpid()}.tmp'
+            with open(temp_path, 'wb') as f:
+                pickle.dump(statements, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, cache_path)
+        except Exception:
+            pass
 
     def run_prompt(self):
         while True:
@@ -69,7 +133,7 @@ class Hoot:
         self.had_error = True
 
     def error(self, token, message: str):
-        if token.type_ == TokenType.EOF:
+        if token.type_ is EOF:
             self.report(token.line, " at end", message)
         else:
             self.report(token.line, f" at '{token.lexeme}'", message)
@@ -1,70 +1,86 @@
 import asyncio
-from tokens import Token, TokenType
-from typing import Dict, List
-from error import BreakJump, RuntimeError
-from environment import Environment
-from callable import HootClass, HootFunction, HootInstance, ReturnBubble
-from expr import Assign, Binary, Call, Expr, ExprVisitor, Grouping, Literal, Logical, Set, Super, This, Unary, Letiable
-from stmt import Block, Expression, Let, Print, Return, Stmt, While, Break
+from tokens import Token
+from tokens import (
+    MINUS, SLASH, STAR, PLUS, GREATER, GREATER_EQUAL, LESS, LESS_EQUAL,
+    BANG, BANG_EQUAL, EQUAL_EQUAL, OR,
+)
+from typing import Callable, Dict, List, Optional, Union
+from error import RuntimeError
+from environment import Environment, GlobalEnvironment
+from callable import HootClass, HootFunction, HootInstance, MISSING, NO_SIGNAL, RETURN, BREAK
+from expr import Assign, Binary, Call, Expr, Get, Grouping, Literal, Logical, Set, Super, This, Unary, Letiable
+from stmt import Block, Class, Expression, Function, If, Let, Print, Return, Stmt, While, Break
 from native import Clock, Delay, StringInstance, StringDataType, ListDataType, MapDataType, Request, Input, Write, Read
 
 
-class Interpreter(ExprVisitor):
+INLINE_CACHE_SIZE = 8
+
+
+class Interpreter:
     def __init__(self, hoot):
         self.hoot = hoot
-        self.globals = Environment(None)
-        self.environment = self.globals
-        self.locals: Dict[Expr, int] = {}
-
-        self.globals.define('input', Input())
-        self.globals.define('read', Read())
-        self.globals.define('write', Write())
-        self.globals.define('clock', Clock())
-        self.globals.define('delay', Delay())
-        self.globals.define('request', Request())
-        self.globals.define('string', StringDataType())
-        self.globals.define('list', ListDataType())
-        self.globals.define('map', MapDataType())
+        self.globals = GlobalEnvironment({
+            'input': Input(),
+            'read': Read(),
+            'write': Write(),
+            'clock': Clock(),
+            'delay': Delay(),
+            'request': Request(),
+            'string': StringDataType(),
+            'list': ListDataType(),
+            'map': MapDataType(),
+        })
+        self.environment: Environment = self.globals
+        self.signal = NO_SIGNAL
+        self.return_value = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
 
     def interpret(self, statements: List[Stmt]):
-        async def main():
-            try:
-                for statement in statements:
-                    self.execute(statement)
-            except RuntimeError as error:
-                self.hoot.runtime_error(error)
-
-        def get_pending_tasks():
-            tasks = asyncio.all_tasks()
-            pending = [task for task in tasks if task !=
-                       run_main_task and not task.done()]
-            return pending
-
-        async def run_main():
-            await main()
-
-            while True:
-                pending_tasks = get_pending_tasks()
-                if len(pending_tasks) == 0:
-                    return
-                await asyncio.gather(*pending_tasks)
+        try:
+            for statement in statements:
+                self.execute(statement)
+                if self.signal != NO_SIGNAL:
+                    # a top level return ends the script
+                    self.signal = NO_SIGNAL
+                    self.return_value = None
+                    break
+        except RuntimeError as error:
+            self.hoot.runtime_error(error)
+
+        self.run_event_loop()
+
+    def ensure_event_loop(self):
+        # natives call this before scheduling a task, scripts that never
+        # do anything asynchronous don't pay for an event loop
+        if self.loop == None:
+            self.loop = asyncio.new_event_loop()
+        return self.loop
+
+    def run_event_loop(self):
+        if self.loop == None:
+            return
 
-        loop = asyncio.new_event_loop()
-        run_main_coro = run_main()
-        run_main_task = loop.create_task(run_main_coro)
-        loop.run_until_complete(run_main_task)
-        loop.close()
+        # callbacks can schedule more tasks so drain until none are left
+        while True:
+            pending = [task for task in asyncio.all_tasks(self.loop)
+                       if not task.done()]
+            if len(pending) == 0:
+                break
+            self.loop.run_until_complete(asyncio.gather(*pending))
+
+        self.loop.close()
+        self.loop = None
 
     def visit_literal_expr(self, expr: Literal):
         return expr.value
 
     def visit_logical_expr(self, expr: Logical):
         left = self.evaluate(expr.left)
-        if expr.operator.type_ == TokenType.OR:
-            if self.is_truthy(left):
+        if expr.operator.type_ is OR:
+            if left is not None and left is not False:
                 return left
         else:
-            if not self.is_truthy(left):
+            if left is None or left is False:
                 return left
         return self.evaluate(expr.right)
 
@@ -78,19 +94,24 @@ class Interpreter(ExprVisitor):
         return value
 
     def visit_super_expr(self, expr: Super):
-        distance = self.locals.get(expr) or -1
+        distance = expr._resolved_distance
         if distance == -1:
             raise RuntimeError(
                 expr.keyword, f"Distance error. Probably because an earlier resolving problem.")
-        superclass = self.environment.get_at(distance, "super")
-        obj = self.environment.get_at(distance - 1, "this")
-        method = superclass.find_method(expr.method.lexeme)
+        # 'super' and 'this' are alone in their scopes so both sit in slot 0
+        superclass = self.environment.get_slot(distance, 0)
+        obj = self.environment.get_slot(distance - 1, 0)
+        if superclass is expr._ic_superclass:
+            return obj.bind(expr._ic_method)
 
+        method = superclass.find_method(expr.method.lexeme)
         if method == None:
             raise RuntimeError(
                 expr.method, f"Undefined property '{expr.method.lexeme}'.")
 
-        return method.bind(obj)
+        expr._ic_superclass = superclass
+        expr._ic_method = method
+        return obj.bind(method)
 
     def visit_this_expr(self, expr: This):
         return self.look_up_variable(expr.keyword, expr)
@@ -99,16 +120,28 @@ class Interpreter(ExprVisitor):
         return self.evaluate(expr.expression)
 
     def evaluate(self, expr: Expr):
-        return expr.accept(self)
+        # dispatch on the node's type directly through the handler table,
+        # literals are the most common node and just hold their value
+        if type(expr) == Literal:
+            return expr.value
+        return self.expr_handlers[type(expr)](self, expr)
 
     def execute(self, stmt: Stmt):
-        stmt.accept(self)
+        self.stmt_handlers[type(stmt)](self, stmt)
 
-    def resolve(self, expr: Expr, depth: int):
-        self.locals[expr] = depth
+    def resolve(self, expr: Union[Assign, Letiable, Super, This], depth: int, slot: int):
+        expr._resolved_distance = depth
+        expr._resolved_slot = slot
+
+    def resolve_builtin(self, expr: Letiable):
+        slot = self.globals.builtin_slots.get(expr.name.lexeme)
+        if slot != None:
+            expr._builtin_slot = slot
 
     def visit_block_stmt(self, stmt: Block):
-        self.execute_block(stmt.statements, Environment(self.environment))
+        if stmt._code == None:
+            stmt._code = self.compile(stmt.statements)
+        self.execute_block(stmt._code, Environment(self.environment))
 
     def visit_class_stmt(self, stmt):
         superclass = None
@@ -117,7 +150,6 @@ class Interpreter(ExprVisitor):
             if type(superclass) != HootClass:
                 raise RuntimeError(stmt.superclass.name,
                                    "Superclass must be a class.")
-        self.environment.define(stmt.name.lexeme, None)
 
         if stmt.superclass != None:
             self.environment = Environment(self.environment)
@@ -134,14 +166,22 @@ class Interpreter(ExprVisitor):
         if superclass != None:
             self.environment = self.environment.enclosing
 
-        self.environment.assign(stmt.name, klass)
+        self.environment.define(stmt.name.lexeme, klass)
+
+    def compile(self, statements: List[Stmt]):
+        # pair each statement with its handler once, so running a block
+        # or function body again is a flat loop of direct calls
+        return [(self.stmt_handlers[type(statement)], statement)
+                for statement in statements]
 
-    def execute_block(self, statements, environment):
+    def execute_block(self, code, environment):
         previous = self.environment
         try:
             self.environment = environment
-            for statement in statements:
-                self.execute(statement)
+            for handler, statement in code:
+                handler(self, statement)
+                if self.signal != NO_SIGNAL:
+                    return
         finally:
             self.environment = previous
 
@@ -153,20 +193,22 @@ class Interpreter(ExprVisitor):
         self.environment.define(stmt.name.lexeme, function)
 
     def visit_if_stmt(self, stmt):
-        if self.is_truthy(self.evaluate(stmt.condition)):
+        condition = self.evaluate(stmt.condition)
+        if condition is not None and condition is not False:
             self.execute(stmt.then_branch)
         elif stmt.else_branch != None:
             self.execute(stmt.else_branch)
 
     def visit_print_stmt(self, stmt: Print):
         value = self.evaluate(stmt.expression)
-        print(self.stringify(value))
+        print('nil' if value is None else str(value))
 
     def visit_return_stmt(self, stmt: Return):
         value = None
         if stmt.value != None:
             value = self.evaluate(stmt.value)
-        raise ReturnBubble(value)
+        self.return_value = value
+        self.signal = RETURN
 
     def visit_var_stmt(self, stmt: Let):
         value = None
@@ -176,22 +218,31 @@ class Interpreter(ExprVisitor):
         self.environment.define(stmt.name.lexeme, value)
 
     def visit_while_stmt(self, stmt: While):
-        while self.is_truthy(self.evaluate(stmt.condition)):
-            try:
-                self.execute(stmt.body)
-            except BreakJump:
+        condition = stmt.condition
+        body = stmt.body
+        # the body's node never changes so find its handler once
+        execute_body = self.stmt_handlers[type(body)]
+        while True:
+            value = self.evaluate(condition)
+            # is_truthy inlined, only nil and false are falsey
+            if value is None or value is False:
+                break
+            execute_body(self, body)
+            if self.signal != NO_SIGNAL:
+                # a return keeps unwinding past the loop
+                if self.signal == BREAK:
+                    self.signal = NO_SIGNAL
                 break
 
     def visit_break_stmt(self, stmt: Break):
-        raise BreakJump(
-            Token(TokenType.BREAK, "break", None, "?"), "Breaking.")
+        self.signal = BREAK
 
     def visit_assign_expr(self, expr: Assign):
         value = self.evaluate(expr.value)
 
-        distance = self.locals[expr] if expr in self.locals else None
-        if distance != None:
-            self.environment.assign_at(distance, expr.name, value)
+        distance = expr._resolved_distance
+        if distance >= 0:
+            self.environment.set_slot(distance, expr._resolved_slot, value)
         else:
             self.globals.assign(expr.name, value)
 
@@ -201,43 +252,73 @@ class Interpreter(ExprVisitor):
         left = self.evaluate(expr.left)
         right = self.evaluate(expr.right)
 
-        if expr.operator.type_ == TokenType.MINUS:
-            self.check_number_operands(expr.operator, left, right)
-            return left - right
-        elif expr.operator.type_ == TokenType.SLASH:
-            self.check_number_operands(expr.operator, left, right)
-            return left / right
-        elif expr.operator.type_ == TokenType.STAR:
-            self.check_number_operands(expr.operator, left, right)
-            return left * right
-        elif expr.operator.type_ == TokenType.PLUS:
-            if type(left) == str and type(right) == str \
-                    or type(left) == float and type(right) == float:
-                return left + right
-            if type(left) == StringInstance and type(right) == StringInstance:
-                return StringInstance(''.join(left.elements) + ''.join(right.elements), expr.operator)
-            if type(left) == str and type(right) == StringInstance:
-                return StringInstance(left + ''.join(right.elements), expr.operator)
-            if type(left) == StringInstance and type(right) == str:
-                return StringInstance(''.join(left.elements) + right, expr.operator)
-            raise RuntimeError(
-                expr.operator, "Operands must be two numbers or two strings.")
-        elif expr.operator.type_ == TokenType.GREATER:
-            self.check_number_operands(expr.operator, left, right)
-            return left > right
-        elif expr.operator.type_ == TokenType.GREATER_EQUAL:
-            self.check_number_operands(expr.operator, left, right)
-            return left >= right
-        elif expr.operator.type_ == TokenType.LESS:
-            self.check_number_operands(expr.operator, left, right)
-            return left < right
-        elif expr.operator.type_ == TokenType.LESS_EQUAL:
-            self.check_number_operands(expr.operator, left, right)
-            return left <= right
-        elif expr.operator.type_ == TokenType.BANG_EQUAL:
-            return not self.is_equal(left, right)
-        elif expr.operator.type_ == TokenType.EQUAL_EQUAL:
-            return self.is_equal(left, right)
+        # the operator of a node never changes so its handler is looked
+        # up once and kept on the node
+        operation = expr._operation
+        if operation == None:
+            operation = self.binary_operations[expr.operator.type_]
+            expr._operation = operation
+        return operation(self, left, right, expr.operator)
+
+    def binary_minus(self, left, right, operator: Token):
+        self.check_number_operands(operator, left, right)
+        return left - right
+
+    def binary_slash(self, left, right, operator: Token):
+        self.check_number_operands(operator, left, right)
+        return left / right
+
+    def binary_star(self, left, right, operator: Token):
+        self.check_number_operands(operator, left, right)
+        return left * right
+
+    def binary_plus(self, left, right, operator: Token):
+        if isinstance(left, str) and isinstance(right, str) \
+                or isinstance(left, float) and isinstance(right, float):
+            return left + right
+        if isinstance(left, StringInstance) and isinstance(right, StringInstance):
+            return StringInstance(left.text + right.text, operator)
+        if isinstance(left, str) and isinstance(right, StringInstance):
+            return StringInstance(left + right.text, operator)
+        if isinstance(left, StringInstance) and isinstance(right, str):
+            return StringInstance(left.text + right, operator)
+        raise RuntimeError(
+            operator, "Operands must be two numbers or two strings.")
+
+    def binary_greater(self, left, right, operator: Token):
+        self.check_number_operands(operator, left, right)
+        return left > right
+
+    def binary_greater_equal(self, left, right, operator: Token):
+        self.check_number_operands(operator, left, right)
+        return left >= right
+
+    def binary_less(self, left, right, operator: Token):
+        self.check_number_operands(operator, left, right)
+        return left < right
+
+    def binary_less_equal(self, left, right, operator: Token):
+        self.check_number_operands(operator, left, right)
+        return left <= right
+
+    def binary_bang_equal(self, left, right, operator: Token):
+        return left != right
+
+    def binary_equal_equal(self, left, right, operator: Token):
+        return left == right
+
+    binary_operations = {
+        MINUS: binary_minus,
+        SLASH: binary_slash,
+        STAR: binary_star,
+        PLUS: binary_plus,
+        GREATER: binary_greater,
+        GREATER_EQUAL: binary_greater_equal,
+        LESS: binary_less,
+        LESS_EQUAL: binary_less_equal,
+        BANG_EQUAL: binary_bang_equal,
+        EQUAL_EQUAL: binary_equal_equal,
+    }
 
     def visit_call_expr(self, expr: Call):
         callee = self.evaluate(expr.callee)
@@ -246,20 +327,53 @@ class Interpreter(ExprVisitor):
         for argument in expr.arguments:
             arguments.append(self.evaluate(argument))
 
-        if not hasattr(callee, 'call'):
-            raise RuntimeError(
-                expr.paren, "Can only call functions and classes.")
+        key = self.call_cache_key(callee)
+        for cached_key, arity in expr._ic_entries:
+            if cached_key is key:
+                break
+        else:
+            if not hasattr(callee, 'call'):
+                raise RuntimeError(
+                    expr.paren, "Can only call functions and classes.")
+            arity = callee.arity(self, arguments)
+            # past this size the call site is megamorphic and always misses
+            if len(expr._ic_entries) < INLINE_CACHE_SIZE:
+                expr._ic_entries.append((key, arity))
 
         function: HootFunction = callee
-        arity = function.arity(self, arguments)
         if len(arguments) != arity and arity != -1:
             raise RuntimeError(
                 expr.paren, f"Expected {arity} arguments but got {len(arguments)}.")
 
         return function.call(self, arguments, expr.paren)
 
-    def visit_get_expr(self, expr):
+    def call_cache_key(self, callee):
+        # arity is fixed per function declaration and per class, and for
+        # native callables it only depends on their type
+        if type(callee) == HootFunction:
+            return callee.declaration
+        if type(callee) == HootClass:
+            return callee
+        return type(callee)
+
+    def visit_get_expr(self, expr: Get):
         obj = self.evaluate(expr.obj)
+        if type(obj) == HootInstance:
+            # fields belong to the instance so they're always checked first,
+            # only the method lookup up the class chain is cached
+            value = obj.fields.get(expr.name.lexeme, MISSING)
+            if value is not MISSING:
+                return value
+            if obj.klass is expr._ic_klass:
+                return obj.bind(expr._ic_method)
+
+            method = obj.klass.find_method(expr.name.lexeme)
+            if method == None:
+                raise RuntimeError(
+                    expr.name, f"Undefined property '{expr.name.lexeme}'.")
+            expr._ic_klass = obj.klass
+            expr._ic_method = method
+            return obj.bind(method)
         if isinstance(obj, HootInstance):
             return obj.get(expr.name)
 
@@ -268,38 +382,54 @@ class Interpreter(ExprVisitor):
     def visit_unary_expr(self, expr: Unary):
         right = self.evaluate(expr.right)
 
-        if expr.operator.type_ == TokenType.MINUS:
+        operator = expr.operator.type_
+        if operator is MINUS:
             self.check_number_operand(expr.operator, right)
             return -right
-        elif expr.operator.type_ == TokenType.BANG:
-            return not self.is_truthy(right)
+        elif operator is BANG:
+            return right is None or right is False
 
     def visit_variable_expr(self, expr: Letiable):
-        return self.look_up_variable(expr.name, expr)
+        if expr._resolved_distance >= 0:
+            return self.environment.get_slot(expr._resolved_distance, expr._resolved_slot)
+        if expr._builtin_slot >= 0:
+            return self.globals.slots[expr._builtin_slot]
+
+        # globals are cached on the node until any global is (re)defined
+        # or assigned, which bumps the environment's version
+        if expr._cached_version == self.globals.version:
+            return expr._cached_value
+        value = self.globals.get(expr.name)
+        expr._cached_version = self.globals.version
+        expr._cached_value = value
+        return value
 
-    def look_up_variable(self, name: Token, expr: Expr):
-        distance = self.locals[expr] if expr in self.locals else None
-        if distance != None:
-            return self.environment.get_at(distance, name.lexeme)
+    def look_up_variable(self, name: Token, expr: Union[Letiable, This]):
+        distance = expr._resolved_distance
+        if distance >= 0:
+            return self.environment.get_slot(distance, expr._resolved_slot)
         else:
             return self.globals.get(name)
 
     def check_number_operand(self, operator: Token, operand):
-        if type(operand) == float:
+        if isinstance(operand, float):
             return
         raise RuntimeError(operator, "Operand must be a number")
 
     def check_number_operands(self, operator: Token, left, right):
-        if type(left) == float and type(right) == float:
+        if isinstance(left, float) and isinstance(right, float):
             return
         raise RuntimeError(operator, "Operand must be a number")
 
+    # the hot paths inline these checks, they're kept for anything else
+    # that needs Hoot's rules
+
     def is_truthy(self, value):
         # Hoot follows Ruby’s simple rule: false and nil are falsey,
         # and everything else is truthy.
         if value == None:
             return False
-        if type(value) == bool:
+        if isinstance(value, bool):
             return value
         return True
 
@@ -310,3 +440,31 @@ class Interpreter(ExprVisitor):
         if value == None:
             return 'nil'
         return str(value)
+
+    expr_handlers: Dict[type, Callable] = {
+        Assign: visit_assign_expr,
+        Binary: visit_binary_expr,
+        Call: visit_call_expr,
+        Get: visit_get_expr,
+        Grouping: visit_grouping_expr,
+        Literal: visit_literal_expr,
+        Logical: visit_logical_expr,
+        Set: visit_set_expr,
+        Super: visit_super_expr,
+        This: visit_this_expr,
+        Unary: visit_unary_expr,
+        Letiable: visit_variable_expr,
+    }
+
+    stmt_handlers: Dict[type, Callable] = {
+        Block: visit_block_stmt,
+        Break: visit_break_stmt,
+        Class: visit_class_stmt,
+        Expression: visit_expression_stmt,
+        Function: visit_function_stmt,
+        If: visit_if_stmt,
+        Print: visit_print_stmt,
+        Return: visit_return_stmt,
+        Let: visit_var_stmt,
+        While: visit_while_stmt,
+    }
@@ -1,15 +1,30 @@
 import os
-from expr import ExprVisitor
 import time
 import asyncio
+from array import array
 import urllib.request
 from concurrent.futures import ThreadPoolExecutor
 from error import RuntimeError
 from tokens import Token
 from callable import HootCallable, HootClass, HootInstance
+from typing import Dict, List, Optional, Union
+
+# file reads and writes run here so they don't block the event loop.
+# It's shared so each call doesn't start and join its own threads
+IO_POOL = ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) + 4))
+
+# the classes of native instances. They have no methods of their own so
+# every instance can share one
+STRING_CLASS = HootClass("String", None, {})
+LIST_CLASS = HootClass("List", None, {})
+MAP_CLASS = HootClass("Map", None, {})
+RESPONSE_CLASS = HootClass("Response", None, {})
 
 
 def is_numberable(value):
+    # Hoot's numbers are floats, so only other values need parsing
+    if isinstance(value, (float, int)):
+        return True
     try:
         float(value)
     except ValueError:
@@ -18,91 +33,177 @@ def is_numberable(value):
 
 
 class StringInstance(HootInstance):
-    def __init__(self, elements: str, error_token: Token):
-        super().__init__(HootClass("String", None, {}))
+    __slots__ = ('error_token', '_text', '_elements', '_encoded', '_methods')
+
+    def __init__(self, text: Union[str, bytes], error_token: Token):
+        super().__init__(STRING_CLASS)
         self.error_token = error_token
-        self.elements = list(str(elements))
+        # kept as a flat str, split into a buffer of characters only once
+        # the string is altered. ASCII text is buffered in a bytearray, a
+        # byte per character, and anything else in a list of characters
+        self._text: Optional[str] = None
+        self._elements: Union[None, bytearray, List[str]] = None
+        # UTF-8 bytes (a response body) are only decoded once they're read
+        self._encoded: Optional[bytes] = None
+        if isinstance(text, bytes):
+            self._encoded = text
+        else:
+            self._text = str(text)
+        self._methods: Optional[Dict[str, HootCallable]] = None
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            if self._encoded is not None:
+                self._text = self._encoded.decode("utf-8", errors="ignore")
+                self._encoded = None
+            elif isinstance(self._elements, bytearray):
+                self._text = self._elements.decode('ascii')
+            else:
+                self._text = ''.join(self._elements or [])
+        return self._text
+
+    def character(self, index: int):
+        elements = self._elements
+        if elements is None:
+            return self.text[index]
+        if isinstance(elements, bytearray):
+            return chr(elements[index])
+        return elements[index]
+
+    def alter(self, index: int, to):
+        to = str(to)
+        # a byte can only hold a single ASCII character
+        fits_byte = len(to) == 1 and to.isascii()
+        elements = self._elements
+        if elements is None:
+            text = self.text
+            if fits_byte and text.isascii():
+                elements = bytearray(text, 'ascii')
+            else:
+                elements = list(text)
+        elif isinstance(elements, bytearray) and not fits_byte:
+            elements = list(elements.decode('ascii'))
+        if isinstance(elements, bytearray):
+            elements[index] = ord(to)
+        else:
+            elements[index] = to
+        self._elements = elements
+        self._text = None
+
+    def length(self):
+        if self._elements is not None:
+            return len(self._elements)
+        return len(self.text)
 
     def get(self, name: Token):
-        elements = self.elements
-        if name.lexeme == "at":
-            class At(HootCallable):
-                def arity(self, interpreter, arguments):
-                    return 1
-
-                def call(self, interpreter, arguments, error_token: Token):
-                    arg = arguments[0]
-                    if not is_numberable(arg):
-                        raise RuntimeError(
-                            error_token, f"'at' only accepts a number index. Got '{arg}'.")
-                    index = int(arg)
-                    if arg > len(elements) - 1:
-                        raise RuntimeError(
-                            error_token, f"'at' out of bounds error.")
-                    return elements[index]
-            return At()
-        elif name.lexeme == "alter":
-            class Alter(HootCallable):
-                def arity(self, interpreter, arguments):
-                    return 2
-
-                def call(self, interpreter, arguments, error_token: Token):
-                    arg = arguments[0]
-                    to = arguments[1]
-                    if not is_numberable(arg):
-                        raise RuntimeError(
-                            error_token, f"'alter' only accepts a number index. Got '{arg}'.")
-                    index = int(arg)
-                    if arg > len(elements) - 1:
-                        raise RuntimeError(
-                            error_token, f"'at' out of bounds error.")
-                    elements[index] = str(to)
-            return Alter()
-        elif name.lexeme == "length":
-            class Length(HootCallable):
-                def arity(self, interpreter, arguments):
-                    return 0
-
-                def call(self, interpreter, arguments, error_token: Token):
-                    return len(elements)
-            return Length()
-        else:
-            raise RuntimeError(
-                self.error_token, f"Can't call '{name.lexeme}' on a string.")
+        # each method is made once per string and reused after that
+        if self._methods is None:
+            self._methods = {}
+        method = self._methods.get(name.lexeme)
+        if method == None:
+            method_type = STRING_METHODS.get(name.lexeme)
+            if method_type == None:
+                raise RuntimeError(
+                    self.error_token, f"Can't call '{name.lexeme}' on a string.")
+            method = method_type(self)
+            self._methods[name.lexeme] = method
+        return method
 
     def __repr__(self):
-        return ''.join(self.elements)
+        return self.text
+
+
+class StringAt(HootCallable):
+    __slots__ = ('string',)
+
+    def __init__(self, string: StringInstance):
+        self.string = string
+
+    def arity(self, interpreter, arguments):
+        return 1
+
+    def call(self, interpreter, arguments, error_token: Token):
+        arg = arguments[0]
+        # indexing does the upper bounds check, only the failures pay for
+        # working out which error it was
+        try:
+            index = int(arg)
+            if index >= 0:
+                return self.string.character(index)
+        except (TypeError, ValueError, OverflowError):
+            raise RuntimeError(
+                error_token, f"'at' only accepts a number index. Got '{arg}'.")
+        except IndexError:
+            pass
+        raise RuntimeError(
+            error_token, f"'at' out of bounds error.")
+
+
+class StringAlter(HootCallable):
+    __slots__ = ('string',)
+
+    def __init__(self, string: StringInstance):
+        self.string = string
+
+    def arity(self, interpreter, arguments):
+        return 2
+
+    def call(self, interpreter, arguments, error_token: Token):
+        arg = arguments[0]
+        to = arguments[1]
+        try:
+            index = int(arg)
+        except (TypeError, ValueError, OverflowError):
+            raise RuntimeError(
+                error_token, f"'alter' only accepts a number index. Got '{arg}'.")
+        if index < 0 or index >= self.string.length():
+            raise RuntimeError(
+                error_token, f"'at' out of bounds error.")
+        self.string.alter(index, to)
+
+
+class StringLength(HootCallable):
+    __slots__ = ('string',)
+
+    def __init__(self, string: StringInstance):
+        self.string = string
+
+    def arity(self, interpreter, arguments):
+        return 0
+
+    def call(self, interpreter, arguments, error_token: Token):
+        return self.string.length()
+
+
+# a string's methods by name, each made with the string it's called on
+STRING_METHODS: Dict[str, type] = {
+    "at": StringAt,
+    "alter": StringAlter,
+    "length": StringLength,
+}
 
 
 class MapInstance(HootInstance):
+    __slots__ = ('store', '_methods')
+
     def __init__(self):
-        super().__init__(HootClass("Map", None, {}))
+        super().__init__(MAP_CLASS)
         self.store = {}
+        self._methods: Optional[Dict[str, HootCallable]] = None
 
     def get(self, name: Token):
-        store = self.store
-        if name.lexeme == "get":
-            class Get(HootCallable):
-                def arity(self, interpreter, arguments):
-                    return 1
-
-                def call(self, interpreter, arguments, error_token: Token):
-                    arg = arguments[0]
-                    return store.get(arg, None)
-            return Get()
-        elif name.lexeme == "set":
-            class Set(HootCallable):
-                def arity(self, interpreter, arguments):
-                    return 2
-
-                def call(self, interpreter, arguments, error_token: Token):
-                    arg = arguments[0]
-                    to = arguments[1]
-                    store[arg] = to
-            return Set()
-        else:
-            raise RuntimeError(
-                name, f"Can't call '{name.lexeme}' on a map.")
+        if self._methods is None:
+            self._methods = {}
+        method = self._methods.get(name.lexeme)
+        if method == None:
+            method_type = MAP_METHODS.get(name.lexeme)
+            if method_type == None:
+                raise RuntimeError(
+                    name, f"Can't call '{name.lexeme}' on a map.")
+            method = method_type(self.store)
+            self._methods[name.lexeme] = method
+        return method
 
     def items(self):
         return self.store.items()
@@ -111,6 +212,67 @@ class MapInstance(HootInstance):
         return str(self.store)
 
 
+class ListInstance(HootInstance):
+    __slots__ = ('error_token', 'elements', '_methods')
+
+    def __init__(self, elements: Union[list, array], error_token: Token):
+        super().__init__(LIST_CLASS)
+        self.error_token = error_token
+        self.elements = elements
+        self._methods: Optional[Dict[str, HootCallable]] = None
+
+    def get(self, name: Token):
+        if self._methods is None:
+            self._methods = {}
+        method = self._methods.get(name.lexeme)
+        if method == None:
+            method_type = LIST_METHODS.get(name.lexeme)
+            if method_type == None:
+                raise RuntimeError(
+                    self.error_token, f"Can't call '{name.lexeme}' on a list.")
+            method = method_type(self.elements)
+            self._methods[name.lexeme] = method
+        return method
+
+    def __repr__(self):
+        return str(list(self.elements))
+
+
+class MapGet(HootCallable):
+    __slots__ = ('store',)
+
+    def __init__(self, store: dict):
+        self.store = store
+
+    def arity(self, interpreter, arguments):
+        return 1
+
+    def call(self, interpreter, arguments, error_token: Token):
+        arg = arguments[0]
+        return self.store.get(arg, None)
+
+
+class MapSet(HootCallable):
+    __slots__ = ('store',)
+
+    def __init__(self, store: dict):
+        self.store = store
+
+    def arity(self, interpreter, arguments):
+        return 2
+
+    def call(self, interpreter, arguments, error_token: Token):
+        arg = arguments[0]
+        to = arguments[1]
+        self.store[arg] = to
+
+
+MAP_METHODS: Dict[str, type] = {
+    "get": MapGet,
+    "set": MapSet,
+}
+
+
 class Input(HootCallable):
     def arity(self, interpreter, arguments):
         return 1
@@ -137,13 +299,11 @@ class Read(HootCallable):
                 return None
 
         async def main():
-            loop = asyncio.get_running_loop()
-            with ThreadPoolExecutor() as pool:
-                data = await loop.run_in_executor(
-                    pool, blocking_read)
-                arguments[1].call(
-                    interpreter, [StringInstance(data, error_token)], error_token)
-        asyncio.create_task(main())
+            data = await loop.run_in_executor(IO_POOL, blocking_read)
+            arguments[1].call(
+                interpreter, [StringInstance(data, error_token)], error_token)
+        loop = interpreter.ensure_event_loop()
+        loop.create_task(main())
 
     def __repr__(self):
         return "<native fn>"
@@ -167,16 +327,11 @@ class Write(HootCallable):
                 return None
 
         async def main():
-            loop = asyncio.get_running_loop()
-            with ThreadPoolExecutor() as pool:
-                await loop.run_in_executor(
-                    pool, blocking_write)
-                if arguments[3]:
-                    arguments[3].call(interpreter, [], error_token)
-        asyncio.create_task(main())
-
-        with open(arguments[0], arguments[1]) as f:
-            f.write(arguments[2])
+            await loop.run_in_executor(IO_POOL, blocking_write)
+            if arguments[3]:
+                arguments[3].call(interpreter, [], error_token)
+        loop = interpreter.ensure_event_loop()
+        loop.create_task(main())
 
     def __repr__(self):
         return "<native fn>"
@@ -206,7 +361,7 @@ class Delay(HootCallable):
                 interpreter.hoot.error(
                     error_token, f"Error in delay callback '{arguments[1]}'. Caught error: {err}")
                 return False
-        asyncio.create_task(sleeper())
+        interpreter.ensure_event_loop().create_task(sleeper())
 
     def __repr__(self):
         return "<native fn>"
@@ -236,27 +391,25 @@ class Request(HootCallable):
                 "body": response.read(),
             }
 
-        @asyncio.coroutine
-        def read_page():
-            loop = asyncio.get_event_loop()
-            data = yield from loop.run_in_executor(None, lambda: return_response())
+        async def read_page():
+            data = await loop.run_in_executor(None, return_response)
 
             if data == False:
                 return
 
-            instance = HootInstance(HootClass("Response", None, {}))
+            instance = HootInstance(RESPONSE_CLASS)
 
             headers = MapInstance()
-            for k, v in data["headers"].items():
-                headers.store[k] = v
+            headers.store.update(data["headers"])
 
             instance.fields = {
-                "body": StringInstance(data["body"].decode("utf-8", errors="ignore"), error_token),
+                "body": StringInstance(data["body"], error_token),
                 "headers": headers,
             }
             callback.call(interpreter, [instance], error_token)
 
-        asyncio.create_task(read_page())
+        loop = interpreter.ensure_event_loop()
+        loop.create_task(read_page())
 
     def __repr__(self):
         return "<native fn>"
@@ -273,89 +426,121 @@ class StringDataType(HootCallable):
         return "<native fn>"
 
 
+class ListAt(HootCallable):
+    __slots__ = ('elements',)
+
+    def __init__(self, elements: Union[list, array]):
+        self.elements = elements
+
+    def arity(self, interpreter, arguments):
+        return 1
+
+    def call(self, interpreter, arguments, error_token: Token):
+        arg = arguments[0]
+        try:
+            index = int(arg)
+            if index >= 0:
+                return self.elements[index]
+        except (TypeError, ValueError, OverflowError):
+            raise RuntimeError(
+                error_token, f"'at' only accepts a number index. Got '{arg}'.")
+        except IndexError:
+            pass
+        raise RuntimeError(
+            error_token, f"'at' out of bounds error.")
+
+
+class ListAlter(HootCallable):
+    __slots__ = ('elements',)
+
+    def __init__(self, elements: Union[list, array]):
+        self.elements = elements
+
+    def arity(self, interpreter, arguments):
+        return 2
+
+    def call(self, interpreter, arguments, error_token: Token):
+        arg = arguments[0]
+        try:
+            index = int(arg)
+        except (TypeError, ValueError, OverflowError):
+            raise RuntimeError(
+                error_token, f"'alter' only accepts a number index. Got '{arg}'.")
+        if index < 0 or index >= len(self.elements):
+            raise RuntimeError(
+                error_token, f"'at' out of bounds error.")
+        to = arguments[1]
+        if type(to) != float:
+            to = float(to)
+        self.elements[index] = to
+
+
+class ListLength(HootCallable):
+    __slots__ = ('elements',)
+
+    def __init__(self, elements: Union[list, array]):
+        self.elements = elements
+
+    def arity(self, interpreter, arguments):
+        return 0
+
+    def call(self, interpreter, arguments, error_token: Token):
+        return float(len(self.elements))
+
+
+class ListPush(HootCallable):
+    __slots__ = ('elements',)
+
+    def __init__(self, elements: Union[list, array]):
+        self.elements = elements
+
+    def arity(self, interpreter, arguments):
+        return 1
+
+    def call(self, interpreter, arguments, error_token: Token):
+        arg = arguments[0]
+        # numbers are pushed as they are, other values are parsed
+        if type(arg) != float:
+            if not is_numberable(arg):
+                raise RuntimeError(
+                    error_token, f"'alter' only accepts numbers. Got '{arg}'.")
+            arg = float(arg)
+        self.elements.append(arg)
+
+
+class ListPop(HootCallable):
+    __slots__ = ('elements',)
+
+    def __init__(self, elements: Union[list, array]):
+        self.elements = elements
+
+    def arity(self, interpreter, arguments):
+        return 0
+
+    def call(self, interpreter, arguments, error_token: Token):
+        return self.elements.pop()
+
+
+LIST_METHODS: Dict[str, type] = {
+    "at": ListAt,
+    "alter": ListAlter,
+    "length": ListLength,
+    "push": ListPush,
+    "pop": ListPop,
+}
+
+
 class ListDataType(HootCallable):
     def arity(self, interpreter, arguments):
         return -1
 
     def call(self, interpreter, arguments, error_token: Token):
-        class ListInstance(HootInstance):
-            def __init__(self, elements: list):
-                super().__init__(HootClass("List", None, {}))
-                self.elements = elements
-
-            def get(self, name: Token):
-                elements = self.elements
-                if name.lexeme == "at":
-                    class At(HootCallable):
-                        def arity(self, interpreter, arguments):
-                            return 1
-
-                        def call(self, interpreter, arguments, error_token: Token):
-                            arg = arguments[0]
-                            if not is_numberable(arg):
-                                raise RuntimeError(
-                                    error_token, f"'at' only accepts a number index. Got '{arg}'.")
-                            index = int(arg)
-                            if arg > len(elements) - 1:
-                                print(arg, len(elements))
-                                raise RuntimeError(
-                                    error_token, f"'at' out of bounds error.")
-                            return elements[index]
-                    return At()
-                elif name.lexeme == "alter":
-                    class Alter(HootCallable):
-                        def arity(self, interpreter, arguments):
-                            return 2
-
-                        def call(self, interpreter, arguments, error_token: Token):
-                            arg = arguments[0]
-                            if not is_numberable(arg):
-                                raise RuntimeError(
-                                    error_token, f"'alter' only accepts a number index. Got '{arg}'.")
-                            index = int(arg)
-                            if arg > len(elements) - 1:
-                                print(arg, len(elements))
-                                raise RuntimeError(
-                                    error_token, f"'at' out of bounds error.")
-                            to = float(arguments[1])
-                            elements[index] = to
-                    return Alter()
-                elif name.lexeme == "length":
-                    class Length(HootCallable):
-                        def arity(self, interpreter, arguments):
-                            return 0
-
-                        def call(self, interpreter, arguments, error_token: Token):
-                            return float(len(elements))
-                    return Length()
-                elif name.lexeme == "push":
-                    class Push(HootCallable):
-                        def arity(self, interpreter, arguments):
-                            return 1
-
-                        def call(self, interpreter, arguments, error_token: Token):
-                            arg = arguments[0]
-                            if not is_numberable(arg):
-                                raise RuntimeError(
-                                    error_token, f"'alter' only accepts numbers. Got '{arg}'.")
-                            index = int(arg)
-                            elements.append(index)
-                    return Push()
-                elif name.lexeme == "pop":
-                    class Pop(HootCallable):
-                        def arity(self, interpreter, arguments):
-                            return 0
-
-                        def call(self, interpreter, arguments, error_token: Token):
-                            return elements.pop()
-                    return Pop()
-                else:
-                    raise RuntimeError(
-                        error_token, f"Can't call '{name.lexeme}' on a list.")
-
-            def __repr__(self):
-                return str(self.elements)
-        return ListInstance(arguments)
+        # push and alter only store numbers, so a list made of numbers
+        # can hold them unboxed. Anything else keeps a Python list
+        elements: Union[list, array] = arguments
+        if all(type(arg) == float for arg in arguments):
+            elements = array('d', arguments)
+        return ListInstance(elements, error_token)
 
     def __repr__(self):
         return "<native fn>"
@@ -0,0 +1,174 @@
+import math
+from typing import Dict, List, Tuple
+from tokens import TokenType
+from expr import Assign, Binary, Grouping, Letiable, Literal, Logical, Unary
+from stmt import Block, Break, Expression, Function, If, Let, Return, While
+
+# the two types a numeric function can work with
+NUMBER_TYPE = 'number'
+BOOLEAN_TYPE = 'boolean'
+
+ARITHMETIC = {
+    TokenType.MINUS: '-',
+    TokenType.SLASH: '/',
+    TokenType.STAR: '*',
+    TokenType.PLUS: '+',
+}
+
+COMPARISON = {
+    TokenType.GREATER: '>',
+    TokenType.GREATER_EQUAL: '>=',
+    TokenType.LESS: '<',
+    TokenType.LESS_EQUAL: '<=',
+}
+
+EQUALITY = {
+    TokenType.BANG_EQUAL: '!=',
+    TokenType.EQUAL_EQUAL: '==',
+}
+
+
+class NotNumeric(Exception):
+    pass
+
+
+class NumericCompiler:
+    """Translates a function that only does arithmetic, comparisons and
+    control flow on numbers into a Python function, so calling it skips
+    the tree walker. Every value's type is known while compiling, which
+    keeps Hoot's semantics: arithmetic only ever sees two numbers and
+    conditions are always booleans. Anything else (calls, properties,
+    strings, nil, globals, closures) makes the function not numeric."""
+
+    def __init__(self, declaration: Function):
+        self.declaration = declaration
+        self.lines: List[str] = []
+        self.scopes: List[Dict[str, Tuple[str, str]]] = []
+        self.names = 0
+
+    def compile(self):
+        try:
+            self.scopes.append({})
+            params = [self.declare(param.lexeme, NUMBER_TYPE)
+                      for param in self.declaration.params]
+            self.statements(self.declaration.body, 1)
+        except NotNumeric:
+            return None
+
+        source = f"def numeric({', '.join(params)}):\n"
+        source += '\n'.join(self.lines) + "\n    return None\n"
+        namespace: Dict = {}
+        exec(source, namespace)
+        return namespace['numeric']
+
+    def declare(self, name: str, type_: str):
+        # every declaration gets its own Python name so shadowing in
+        # nested blocks works in Python's single function scope
+        python_name = f"v{self.names}"
+        self.names += 1
+        self.scopes[-1][name] = (python_name, type_)
+        return python_name
+
+    def look_up(self, name: str):
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return scope[name]
+        raise NotNumeric()
+
+    def emit(self, depth: int, line: str):
+        self.lines.append('    ' * depth + line)
+
+    def statements(self, statements, depth: int):
+        emitted = len(self.lines)
+        for statement in statements:
+            self.statement(statement, depth)
+        if len(self.lines) == emitted:
+            self.emit(depth, 'pass')
+
+    def statement(self, stmt, depth: int):
+        if type(stmt) == Block:
+            self.scopes.append({})
+            self.statements(stmt.statements, depth)
+            self.scopes.pop()
+        elif type(stmt) == Let:
+            if stmt.initializer == None:
+                raise NotNumeric()
+            value, type_ = self.expression(stmt.initializer)
+            self.emit(depth, f"{self.declare(stmt.name.lexeme, type_)} = {value}")
+        elif type(stmt) == Expression and type(stmt.expression) == Assign:
+            name, type_ = self.look_up(stmt.expression.name.lexeme)
+            value, value_type = self.expression(stmt.expression.value)
+            if value_type != type_:
+                raise NotNumeric()
+            self.emit(depth, f"{name} = {value}")
+        elif type(stmt) == Expression:
+            self.emit(depth, self.expression(stmt.expression)[0])
+        elif type(stmt) == If:
+            self.emit(depth, f"if {self.condition(stmt.condition)}:")
+            self.statements([stmt.then_branch], depth + 1)
+            if stmt.else_branch != None:
+                self.emit(depth, "else:")
+                self.statements([stmt.else_branch], depth + 1)
+        elif type(stmt) == While:
+            self.emit(depth, f"while {self.condition(stmt.condition)}:")
+            self.statements([stmt.body], depth + 1)
+        elif type(stmt) == Break:
+            self.emit(depth, "break")
+        elif type(stmt) == Return:
+            if stmt.value == None:
+                self.emit(depth, "return None")
+            else:
+                self.emit(depth, f"return {self.expression(stmt.value)[0]}")
+        else:
+            raise NotNumeric()
+
+    def condition(self, expr):
+        # Hoot treats every number as true but Python treats 0 as false,
+        # so only booleans can be used as conditions
+        value, type_ = self.expression(expr)
+        if type_ != BOOLEAN_TYPE:
+            raise NotNumeric()
+        return value
+
+    def expression(self, expr):
+        if type(expr) == Literal:
+            if type(expr.value) == float:
+                # a literal too big for a float is inf, which repr doesn't
+                # write as valid Python
+                if not math.isfinite(expr.value):
+                    return f"float('{expr.value!r}')", NUMBER_TYPE
+                return repr(expr.value), NUMBER_TYPE
+            if type(expr.value) == bool:
+                return repr(expr.value), BOOLEAN_TYPE
+            raise NotNumeric()
+        if type(expr) == Grouping:
+            return self.expression(expr.expression)
+        if type(expr) == Letiable:
+            return self.look_up(expr.name.lexeme)
+        if type(expr) == Unary:
+            right, type_ = self.expression(expr.right)
+            if expr.operator.type_ == TokenType.MINUS and type_ == NUMBER_TYPE:
+                return f"(-{right})", NUMBER_TYPE
+            if expr.operator.type_ == TokenType.BANG and type_ == BOOLEAN_TYPE:
+                return f"(not {right})", BOOLEAN_TYPE
+            raise NotNumeric()
+        if type(expr) == Binary:
+            left, left_type = self.expression(expr.left)
+            right, right_type = self.expression(expr.right)
+            operator = expr.operator.type_
+            if operator in EQUALITY:
+                return f"({left} {EQUALITY[operator]} {right})", BOOLEAN_TYPE
+            if left_type != NUMBER_TYPE or right_type != NUMBER_TYPE:
+                raise NotNumeric()
+            if operator in ARITHMETIC:
+                return f"({left} {ARITHMETIC[operator]} {right})", NUMBER_TYPE
+            if operator in COMPARISON:
+                return f"({left} {COMPARISON[operator]} {right})", BOOLEAN_TYPE
+        if type(expr) == Logical:
+            # 'and' and 'or' give back an operand, which is only the same
+            # in Python when both operands are booleans
+            left = self.condition(expr.left)
+            right = self.condition(expr.right)
+            operator = 'or' if expr.operator.type_ == TokenType.OR else 'and'
+            return f"({left} {operator} {right})", BOOLEAN_TYPE
+        raise NotNumeric()
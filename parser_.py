@@ -1,23 +1,70 @@
-from native import StringInstance
 from hoot import Hoot
-from typing import List
+from typing import FrozenSet
 from error import ParseError
-from tokens import Token, TokenType
+from tokens import Token, TokenStream, TokenType
+from tokens import (
+    LEFT_PAREN, RIGHT_PAREN, LEFT_BRACE, RIGHT_BRACE, COMMA, DOT, MINUS, PLUS,
+    SEMICOLON, SLASH, STAR, BANG, BANG_EQUAL, EQUAL, EQUAL_EQUAL, GREATER,
+    GREATER_EQUAL, LESS, LESS_EQUAL, IDENTIFIER, STRING, NUMBER, AND, BREAK,
+    CLASS, ELSE, FALSE, FUN, FOR, IF, NIL, OR, PRINT, RETURN, SUPER, THIS,
+    TRUE, LET, WHILE, EOF,
+)
 from expr import Assign, Binary, Call, Get, Grouping, Letiable, Literal, Logical, Set, Super, This, Unary
 from stmt import Block, Break, Class, Expression, Function, If, Let, Print, Return, While
 
+# how tightly each infix operator binds, from 'or' (loosest) up to '*' and '/'
+BINARY_PRECEDENCE = {
+    OR: 1,
+    AND: 2,
+    BANG_EQUAL: 3,
+    EQUAL_EQUAL: 3,
+    GREATER: 4,
+    GREATER_EQUAL: 4,
+    LESS: 4,
+    LESS_EQUAL: 4,
+    MINUS: 5,
+    PLUS: 5,
+    SLASH: 6,
+    STAR: 6,
+}
+
+UNARY_OPERATORS = frozenset([BANG, MINUS])
+
+# keywords that start a declaration or statement, where parsing can pick
+# up again after an error
+SYNCHRONIZE_KEYWORDS = frozenset([
+    CLASS, FUN, LET, FOR, IF, WHILE, BREAK, PRINT, RETURN])
+
+# literals that never change are shared by every parse rather than
+# allocated for each use
+TRUE_LITERAL = Literal(True)
+FALSE_LITERAL = Literal(False)
+NIL_LITERAL = Literal(None)
+
+# statements that add a name to the scope they're in
+DECLARATIONS = frozenset([Class, Function, Let])
+
+# tokens that start a statement other than an expression statement
+STATEMENT_KEYWORDS = frozenset([FOR, IF, PRINT, RETURN, WHILE, BREAK, LEFT_BRACE])
+
+# tokens that can start a primary expression
+PRIMARY_TOKENS = frozenset([
+    FALSE, TRUE, NIL, NUMBER, STRING, SUPER, THIS, IDENTIFIER, LEFT_PAREN])
+
 
 class Parser:
-    def __init__(self, hoot: Hoot, tokens: List[Token]):
+    def __init__(self, hoot: Hoot, tokens: TokenStream):
         self.hoot = hoot
         self.current = 0
         self.tokens = tokens
+        # the parser mostly only needs the type of each token
+        self.types = tokens.types
         self._lambda = 0
         return
 
     def parse(self):
         statements = []
-        while not self.is_at_end():
+        while self.types[self.current] is not EOF:
             statements.append(self.declaration())
         return statements
 
@@ -26,11 +73,15 @@ class Parser:
 
     def declaration(self):
         try:
-            if self.match([TokenType.CLASS]):
+            type_ = self.types[self.current]
+            if type_ is CLASS:
+                self.current += 1
                 return self.class_declaration()
-            if self.match([TokenType.FUN]):
+            if type_ is FUN:
+                self.current += 1
                 return self.function("function")
-            if self.match([TokenType.LET]):
+            if type_ is LET:
+                self.current += 1
                 return self.var_declaration()
 
             return self.statement()
@@ -38,69 +89,79 @@ class Parser:
             self.synchronize()
 
     def class_declaration(self):
-        name = self.consume(TokenType.IDENTIFIER, "Expect class name.")
+        name = self.consume(IDENTIFIER, "Expect class name.")
 
         superclass = None
-        if self.match([TokenType.LESS]):
-            self.consume(TokenType.IDENTIFIER, "Expect superclass name")
+        if self.match_one(LESS):
+            self.expect(IDENTIFIER, "Expect superclass name")
             superclass = Letiable(self.previous())
 
-        self.consume(TokenType.LEFT_BRACE, "Expect '{' before class body.")
+        self.expect(LEFT_BRACE, "Expect '{' before class body.")
 
         methods = []
-        while not self.check(TokenType.RIGHT_BRACE) and not self.is_at_end():
+        while self.types[self.current] is not RIGHT_BRACE and self.types[self.current] is not EOF:
             methods.append(self.function("method"))
 
-        self.consume(TokenType.RIGHT_BRACE, "Expect '}' after class body.")
+        self.expect(RIGHT_BRACE, "Expect '}' after class body.")
         return Class(name, superclass, methods)
 
     def statement(self):
-        if self.match([TokenType.FOR]):
-            return self.for_statement()
-        if self.match([TokenType.IF]):
-            return self.if_statement()
-        if self.match([TokenType.PRINT]):
-            return self.print_statement()
-        if self.match([TokenType.RETURN]):
-            return self.return_statement()
-        if self.match([TokenType.WHILE]):
-            return self.while_statement()
-        if self.match([TokenType.BREAK]):
-            return self.break_statement()
-        if self.match([TokenType.LEFT_BRACE]):
+        # the current type is read once and the keyword consumed in the
+        # branch it picks, rather than trying a match for each statement
+        type_ = self.types[self.current]
+        if type_ in STATEMENT_KEYWORDS:
+            self.current += 1
+            if type_ is FOR:
+                return self.for_statement()
+            if type_ is IF:
+                return self.if_statement()
+            if type_ is PRINT:
+                return self.print_statement()
+            if type_ is RETURN:
+                return self.return_statement()
+            if type_ is WHILE:
+                return self.while_statement()
+            if type_ is BREAK:
+                return self.break_statement()
             return Block(self.block())
         return self.expression_statement()
 
     def for_statement(self):
-        self.consume(TokenType.LEFT_PAREN, "Expect '(' after 'for'.")
+        self.expect(LEFT_PAREN, "Expect '(' after 'for'.")
 
         initializer = None
-        if self.match([TokenType.SEMICOLON]):
+        if self.match_one(SEMICOLON):
             initializer = None
-        elif self.match([TokenType.LET]):
+        elif self.match_one(LET):
             initializer = self.var_declaration()
         else:
             initializer = self.expression_statement()
 
         condition = None
-        if not self.check(TokenType.SEMICOLON):
+        if not self.check(SEMICOLON):
             condition = self.expression()
-        self.consume(TokenType.SEMICOLON, "Expect ';' after loop condition.")
+        self.expect(SEMICOLON, "Expect ';' after loop condition.")
 
         increment = None
-        if not self.check(TokenType.RIGHT_PAREN):
+        if not self.check(RIGHT_PAREN):
             increment = self.expression()
-        self.consume(TokenType.RIGHT_PAREN, "Expect ')' after for clauses.")
+        self.expect(RIGHT_PAREN, "Expect ')' after for clauses.")
         body = self.statement()
 
         if increment != None:
-            body = Block([
-                body,
-                Expression(increment),
-            ])
+            if type(body) == Block and not any(
+                    type(statement) in DECLARATIONS for statement in body.statements):
+                # a body that declares nothing can share a block with the
+                # increment, saving a scope on every iteration
+                body = Block(body.statements + [Expression(increment)])
+            else:
+                body = Block([
+                    body,
+                    Expression(increment),
+                ])
 
         if condition == None:
-            condition = Literal(True)
+            condition = TRUE_LITERAL
         body = While(condition, body)
 
         if initializer != None:
@@ -112,68 +173,68 @@ class Parser:
         return body
 
     def if_statement(self):
-        self.consume(TokenType.LEFT_PAREN, "Expect '(' after 'if'.")
+        self.expect(LEFT_PAREN, "Expect '(' after 'if'.")
         condition = self.expression()
-        self.consume(TokenType.RIGHT_PAREN, "Expect ')' after if condition.")
+        self.expect(RIGHT_PAREN, "Expect ')' after if condition.")
 
         then_branch = self.statement()
         else_branch = None
-        if self.match([TokenType.ELSE]):
+        if self.match_one(ELSE):
             else_branch = self.statement()
 
         return If(condition, then_branch, else_branch)
 
     def print_statement(self):
         value = self.expression()
-        self.consume(TokenType.SEMICOLON, "Expect ';' after value.")
+        self.expect(SEMICOLON, "Expect ';' after value.")
         return Print(value)
 
     def return_statement(self):
         keyword = self.previous()
         value = None
-        if not self.check(TokenType.SEMICOLON):
+        if not self.check(SEMICOLON):
             value = self.expression()
 
-        self.consume(TokenType.SEMICOLON, "Expect ';' after return value.")
+        self.expect(SEMICOLON, "Expect ';' after return value.")
         return Return(keyword, value)
 
     def var_declaration(self):
-        name = self.consume(TokenType.IDENTIFIER, "Expect variable name.")
+        name = self.consume(IDENTIFIER, "Expect variable name.")
 
         initializer = None
-        if self.match([TokenType.EQUAL]):
+        if self.match_one(EQUAL):
             initializer = self.expression()
 
-        self.consume(TokenType.SEMICOLON,
-                     "Expect ';' after variable declaration.")
+        self.expect(SEMICOLON,
+                    "Expect ';' after variable declaration.")
         return Let(name, initializer)
 
     def while_statement(self):
-        self.consume(TokenType.LEFT_PAREN, "Expect '(' after 'while'.")
+        self.expect(LEFT_PAREN, "Expect '(' after 'while'.")
         condition = self.expression()
-        self.consume(TokenType.RIGHT_PAREN, "Expect ')' after condition.")
+        self.expect(RIGHT_PAREN, "Expect ')' after condition.")
         body = self.statement()
 
         return While(condition, body)
 
     def break_statement(self):
-        self.consume(TokenType.SEMICOLON,
-                     "Expect ';' after 'break' statement.")
+        self.expect(SEMICOLON,
+                    "Expect ';' after 'break' statement.")
         return Break()
 
     def expression_statement(self):
         value = self.expression()
-        self.consume(TokenType.SEMICOLON, "Expect ';' after expression.")
+        self.expect(SEMICOLON, "Expect ';' after expression.")
         return Expression(value)
 
     def function(self, kind: str):
-        name = self.consume(TokenType.IDENTIFIER, f"Expect '{kind}' name.")
-        self.consume(TokenType.LEFT_PAREN, f"Expect '(' after {kind} name.")
+        name = self.consume(IDENTIFIER, f"Expect '{kind}' name.")
+        self.expect(LEFT_PAREN, f"Expect '(' after {kind} name.")
         parameters = []
-        if not self.check(TokenType.RIGHT_PAREN):
+        if not self.check(RIGHT_PAREN):
             parameters.append(self.consume(
-                TokenType.IDENTIFIER, "Expect parameter name."))
-            while self.match([TokenType.COMMA]):
+                IDENTIFIER, "Expect parameter name."))
+            while self.match_one(COMMA):
 
                 # https://craftinginterpreters.com/functions.html#maximum-argument-counts
                 if len(parameters) >= 255:
@@ -181,23 +242,23 @@ class Parser:
                         self.peek(), "Can't have more than 255 parameters.")
 
                 parameters.append(self.consume(
-                    TokenType.IDENTIFIER, "Expect parameter name."))
+                    IDENTIFIER, "Expect parameter name."))
 
-        self.consume(TokenType.RIGHT_PAREN, "Expect ')' after parameters.")
-        self.consume(TokenType.LEFT_BRACE, f"Expect '}}' before {kind} body.")
+        self.expect(RIGHT_PAREN, "Expect ')' after parameters.")
+        self.expect(LEFT_BRACE, f"Expect '}}' before {kind} body.")
         body = self.block()
         return Function(name, parameters, body)
 
     def block(self):
         statements = []
-        while not self.check(TokenType.RIGHT_BRACE) and not self.is_at_end():
+        while self.types[self.current] is not RIGHT_BRACE and self.types[self.current] is not EOF:
             statements.append(self.declaration())
-        self.consume(TokenType.RIGHT_BRACE, "Expect '}' after block.")
+        self.expect(RIGHT_BRACE, "Expect '}' after block.")
         return statements
 
     def assignment(self):
-        expr = self.or_()
-        if self.match([TokenType.EQUAL]):
+        expr = self.binary(1)
+        if self.match_one(EQUAL):
             equals = self.previous()
             value = self.assignment()
 
@@ -210,56 +271,25 @@ class Parser:
             self.error(equals, "Invalid assignment target.")
         return expr
 
-    def or_(self):
-        expr = self.and_()
-        while self.match([TokenType.OR]):
-            operator = self.previous()
-            right = self.and_()
-            expr = Logical(expr, operator, right)
-        return expr
-
-    def and_(self):
-        expr = self.equality()
-        while self.match([TokenType.AND]):
-            operator = self.previous()
-            right = self.equality()
-            expr = Logical(expr, operator, right)
-        return expr
-
-    def equality(self):
-        expr = self.comparison()
-        while self.match([TokenType.BANG_EQUAL, TokenType.EQUAL_EQUAL]):
-            operator = self.previous()
-            right = self.comparison()
-            expr = Binary(expr, operator, right)
-        return expr
-
-    def comparison(self):
-        expr = self.term()
-        while self.match([TokenType.GREATER, TokenType.GREATER_EQUAL, TokenType.LESS, TokenType.LESS_EQUAL]):
-            operator = self.previous()
-            right = self.term()
-            expr = Binary(expr, operator, right)
-        return expr
-
-    def term(self):
-        expr = self.factor()
-        while self.match([TokenType.MINUS, TokenType.PLUS]):
-            operator = self.previous()
-            right = self.factor()
-            expr = Binary(expr, operator, right)
-        return expr
-
-    def factor(self):
+    def binary(self, min_precedence: int):
+        # precedence climbing, each operator's right operand only takes
+        # operators that bind tighter so chains stay left-associative
         expr = self.unary()
-        while self.match([TokenType.SLASH, TokenType.STAR]):
-            operator = self.previous()
-            right = self.unary()
-            expr = Binary(expr, operator, right)
-        return expr
+        while True:
+            type_ = self.types[self.current]
+            precedence = BINARY_PRECEDENCE.get(type_, 0)
+            if precedence < min_precedence:
+                return expr
+            self.current += 1
+            operator = self.tokens[self.current-1]
+            right = self.binary(precedence + 1)
+            if type_ is OR or type_ is AND:
+                expr = Logical(expr, operator, right)
+            else:
+                expr = Binary(expr, operator, right)
 
     def unary(self):
-        if self.match([TokenType.BANG, TokenType.MINUS]):
+        if self.match(UNARY_OPERATORS):
             operator = self.previous()
             right = self.unary()
             return Unary(operator, right)
@@ -267,9 +297,9 @@ class Parser:
 
     def finish_call(self, callee):
         arguments = []
-        if not self.check(TokenType.RIGHT_PAREN):
+        if not self.check(RIGHT_PAREN):
             arguments.append(self.expression())
-            while self.match([TokenType.COMMA]):
+            while self.match_one(COMMA):
 
                 # https://craftinginterpreters.com/functions.html#maximum-argument-counts
                 if len(arguments) >= 255:
@@ -278,7 +308,7 @@ class Parser:
 
                 arguments.append(self.expression())
 
-        paren = self.consume(TokenType.RIGHT_PAREN,
+        paren = self.consume(RIGHT_PAREN,
                              "Expect ')' after arguments.")
 
         return Call(callee, paren, arguments)
@@ -286,10 +316,10 @@ class Parser:
     def call(self):
         expr = self.primary()
         while True:
-            if self.match([TokenType.LEFT_PAREN]):
+            if self.match_one(LEFT_PAREN):
                 expr = self.finish_call(expr)
-            elif self.match([TokenType.DOT]):
-                name = self.consume(TokenType.IDENTIFIER,
+            elif self.match_one(DOT):
+                name = self.consume(IDENTIFIER,
                                     "Expect property name after '.'.")
                 expr = Get(expr, name)
             else:
@@ -297,60 +327,71 @@ class Parser:
         return expr
 
     def primary(self):
-        if self.match([TokenType.FALSE]):
-            return Literal(False)
-        if self.match([TokenType.TRUE]):
-            return Literal(True)
-        if self.match([TokenType.NIL]):
-            return Literal(None)
-
-        if self.match([TokenType.NUMBER, TokenType.STRING]):
-            return Literal(self.previous().literal)
-
-        if self.match([TokenType.SUPER]):
-            keyword = self.previous()
-            self.consume(TokenType.DOT, "Expect '.' after 'super'.")
-            method = self.consume(TokenType.IDENTIFIER,
+        token = self.tokens[self.current]
+        type_ = token.type_
+        if type_ not in PRIMARY_TOKENS:
+            raise self.error(token, "Expect expression.")
+        self.current += 1
+
+        if type_ is IDENTIFIER:
+            return Letiable(token)
+        if type_ is NUMBER or type_ is STRING:
+            return Literal(token.literal)
+        if type_ is FALSE:
+            return FALSE_LITERAL
+        if type_ is TRUE:
+            return TRUE_LITERAL
+        if type_ is NIL:
+            return NIL_LITERAL
+
+        if type_ is SUPER:
+            self.expect(DOT, "Expect '.' after 'super'.")
+            method = self.consume(IDENTIFIER,
                                   "Expect superclass method name.")
-            return Super(keyword, method)
-
-        if self.match([TokenType.THIS]):
-            return This(self.previous())
+            return Super(token, method)
 
-        if self.match([TokenType.IDENTIFIER]):
-            return Letiable(self.previous())
+        if type_ is THIS:
+            return This(token)
 
-        if self.match([TokenType.LEFT_PAREN]):
-            expr = self.expression()
-            self.consume(TokenType.RIGHT_PAREN, "Expect ')' after expression.")
-            return Grouping(expr)
-
-        raise self.error(self.peek(), "Expect expression.")
+        expr = self.expression()
+        self.expect(RIGHT_PAREN, "Expect ')' after expression.")
+        return Grouping(expr)
 
     def consume(self, type_: TokenType, message: str):
-        if self.check(type_):
-            return self.advance()
+        if self.types[self.current] is type_:
+            self.current += 1
+            return self.tokens[self.current-1]
         raise self.error(self.peek(), message)
 
-    def match(self, types: List[TokenType]):
-        for type_ in types:
-            if self.check(type_):
-                self.advance()
-                return True
+    def expect(self, type_: TokenType, message: str):
+        # consume for when the token itself isn't needed, so no Token is made
+        if self.types[self.current] is type_:
+            self.current += 1
+            return
+        raise self.error(self.peek(), message)
+
+    # these never move past EOF, the parser doesn't ask for EOF so it is
+    # never the type being matched
+
+    def match(self, types: FrozenSet[TokenType]):
+        if self.types[self.current] in types:
+            self.current += 1
+            return True
+        return False
+
+    def match_one(self, type_: TokenType):
+        if self.types[self.current] is type_:
+            self.current += 1
+            return True
         return False
 
     def check(self, type_: TokenType):
-        if self.is_at_end():
-            return False
-        return self.peek().type_ == type_
+        return self.types[self.current] is type_
 
     def advance(self):
-        if not self.is_at_end():
+        if self.types[self.current] is not EOF:
             self.current += 1
-        return self.previous()
-
-    def is_at_end(self):
-        return self.peek().type_ == TokenType.EOF
+        return self.tokens[self.current-1]
 
     def peek(self):
         return self.tokens[self.current]
@@ -360,25 +401,15 @@ class Parser:
 
     def error(self, token: Token, message: str):
         self.hoot.error(token, message)
-        return ParseError(f'{token} {message}')
+        return ParseError(token, message)
 
     def synchronize(self):
         self.advance()
 
-        while not self.is_at_end():
-            if self.previous().type_ == TokenType.SEMICOLON:
+        while self.types[self.current] is not EOF:
+            if self.types[self.current-1] is SEMICOLON:
                 return
 
-            if self.peek() in [
-                TokenType.CLASS,
-                TokenType.FUN,
-                TokenType.LET,
-                TokenType.FOR,
-                TokenType.IF,
-                TokenType.WHILE,
-                TokenType.BREAK,
-                TokenType.PRINT,
-                TokenType.RETURN,
-            ]:
+            if self.types[self.current] in SYNCHRONIZE_KEYWORDS:
                 return
             self.advance()
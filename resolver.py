@@ -1,8 +1,8 @@
 from enum import Enum, auto
-from typing import Dict, List, TYPE_CHECKING
+from typing import Callable, Dict, List, Tuple, TYPE_CHECKING
 from tokens import Token
-from stmt import Break
-from expr import Letiable, This
+from stmt import Block, Break, Class, Expression, Function, If, Let, Print, Return, While
+from expr import Assign, Binary, Call, Get, Grouping, Letiable, Literal, Logical, Set, Super, This, Unary
 # from hoot import Hoot
 
 
@@ -29,6 +29,14 @@ class Resolver:
         self.interpreter = hoot.interpreter
         self.hoot = hoot
         self.scopes: List[Dict[str, bool]] = [{}]
+        # the index of the innermost scope, the global scope is 0
+        self.depth = 0
+        # emptied scope dicts, reused by begin_scope
+        self.scope_pool: List[Dict[str, bool]] = []
+        # for each name in scope, the (scope index, slot) of every
+        # declaration of it, innermost last, so resolving a name doesn't
+        # search through the scopes
+        self.name_stack: Dict[str, List[Tuple[int, int]]] = {}
         self.current_function = FunctionType.NONE
         self.current_class = ClassType.NONE
         self.current_statement = StatementType.NONE
@@ -55,9 +63,11 @@ class Resolver:
 
         if stmt.superclass != None:
             self.begin_scope()
+            self.declare_name("super")
             self.scopes[-1]["super"] = True
 
         self.begin_scope()
+        self.declare_name("this")
         self.scopes[-1]["this"] = True
 
         for method in stmt.methods:
@@ -73,7 +83,7 @@ class Resolver:
         self.current_class = enclosing_class
 
     def visit_expression_stmt(self, stmt):
-        self.resolve_stmt(stmt.expression)
+        self.resolve_expr(stmt.expression)
 
     def visit_function_stmt(self, stmt):
         self.declare(stmt.name)
@@ -81,7 +91,7 @@ class Resolver:
         self.resolve_function(stmt, FunctionType.FUNCTION)
 
     def visit_if_stmt(self, stmt):
-        self.resolve_stmt(stmt.condition)
+        self.resolve_expr(stmt.condition)
         self.resolve_stmt(stmt.then_branch)
         if stmt.else_branch != None:
             self.resolve_stmt(stmt.else_branch)
@@ -100,7 +110,7 @@ class Resolver:
         self.resolve_expr(stmt.condition)
         enclosing = self.current_statement
         self.current_statement = StatementType.WHILE
-        self.resolve_expr(stmt.body)
+        self.resolve_stmt(stmt.body)
         self.current_statement = enclosing
 
     def visit_break_stmt(self, stmt):
@@ -115,11 +125,14 @@ class Resolver:
         self.define(stmt.name)
 
     def visit_variable_expr(self, expr):
-        if len(self.scopes) == 0:
-            if expr.name.lexeme in self.scopes[-1] and self.scopes[-1][expr.name.lexeme] == False:
-                self.hoot.error(expr.keyword,
-                                "Can't read local variable in its own initializer.")
-        self.resolve_local(expr, expr.name)
+        # declared but not yet defined means we're inside its initializer.
+        # Globals are left to fail at runtime, as in Lox
+        if self.depth > 0 and self.scopes[-1].get(expr.name.lexeme) == False:
+            self.hoot.error(expr.name,
+                            "Can't read local variable in its own initializer.")
+        if not self.resolve_local(expr, expr.name) \
+                and expr.name.lexeme not in self.scopes[0]:
+            self.interpreter.resolve_builtin(expr)
 
     def visit_assign_expr(self, expr):
         self.resolve_expr(expr.value)
@@ -169,22 +182,15 @@ class Resolver:
     def visit_unary_expr(self, expr):
         self.resolve_expr(expr.right)
 
-    def visit_var_expr(self, expr: Letiable):
-        if len(self.scopes) != 0:
-            if expr.name.lexeme in self.scopes and self.scopes[expr.name.lexeme] == False:
-                self.interpreter.hoot.error(
-                    expr.name, "Can't read local variable in its own initializer.")
-        self.resolve_local(expr, expr.name)
-
     def resolve_stmts(self, statements):
         for statement in statements:
             self.resolve_stmt(statement)
 
     def resolve_stmt(self, stmt):
-        stmt.accept(self)
+        self.stmt_handlers[type(stmt)](self, stmt)
 
     def resolve_expr(self, expr):
-        expr.accept(self)
+        self.expr_handlers[type(expr)](self, expr)
 
     def resolve_function(self, function, function_type):
         enclosing_function = self.current_function
@@ -199,27 +205,74 @@ class Resolver:
         self.current_function = enclosing_function
 
     def begin_scope(self):
-        self.scopes.append({})
+        self.scopes.append(self.scope_pool.pop() if self.scope_pool else {})
+        self.depth += 1
 
     def end_scope(self):
-        self.scopes.pop()
+        scope = self.scopes.pop()
+        self.depth -= 1
+        for lexeme in scope:
+            stack = self.name_stack[lexeme]
+            stack.pop()
+            if len(stack) == 0:
+                del self.name_stack[lexeme]
+        scope.clear()
+        self.scope_pool.append(scope)
 
     def declare(self, name: Token):
-        if len(self.scopes) == 0:
-            return None
-        scope = self.scopes[-1]
-        if name.lexeme in scope:
+        if name.lexeme in self.scopes[-1]:
             self.hoot.error(name,
                             "Already variable with this name in this scope.")
-        scope[name.lexeme] = False
+        else:
+            self.declare_name(name.lexeme)
+        self.scopes[-1][name.lexeme] = False
+
+    def declare_name(self, lexeme: str):
+        # declarations are defined at runtime in the order they were
+        # declared, so a name's position in its scope is its slot
+        scope_index = self.depth
+        slot = len(self.scopes[-1])
+        self.name_stack.setdefault(lexeme, []).append((scope_index, slot))
 
     def define(self, name: Token):
-        if len(self.scopes) == 0:
-            return None
         self.scopes[-1][name.lexeme] = True
 
     def resolve_local(self, expr, name: Token):
-        for i in range(len(self.scopes)-1, -1, -1):
-            if name.lexeme in self.scopes[i]:
-                self.interpreter.resolve(expr, len(self.scopes) - 1 - i)
-                return
+        stack = self.name_stack.get(name.lexeme)
+        if stack == None:
+            return False
+        scope_index, slot = stack[-1]
+        # the outermost scope is the global environment, which is looked
+        # up by name at runtime so its variables aren't resolved
+        if scope_index == 0:
+            return False
+        self.interpreter.resolve(expr, self.depth - scope_index, slot)
+        return True
+
+    expr_handlers: Dict[type, Callable] = {
+        Assign: visit_assign_expr,
+        Binary: visit_binary_expr,
+        Call: visit_call_expr,
+        Get: visit_get_expr,
+        Grouping: visit_grouping_expr,
+        Literal: visit_literal_expr,
+        Logical: visit_logical_expr,
+        Set: visit_set_expr,
+        Super: visit_super_expr,
+        This: visit_this_expr,
+        Unary: visit_unary_expr,
+        Letiable: visit_variable_expr,
+    }
+
+    stmt_handlers: Dict[type, Callable] = {
+        Block: visit_block_stmt,
+        Break: visit_break_stmt,
+        Class: visit_class_stmt,
+        Expression: visit_expression_stmt,
+        Function: visit_function_stmt,
+        If: visit_if_stmt,
+        Print: visit_print_stmt,
+        Return: visit_return_stmt,
+        Let: visit_var_stmt,
+        While: visit_while_stmt,
+    }
@@ -1,5 +1,71 @@
-from typing import List
-from tokens import Token, TokenType
+import re
+import string
+import sys
+from tokens import Token, TokenStream
+from tokens import (
+    LEFT_PAREN, RIGHT_PAREN, LEFT_BRACE, RIGHT_BRACE, COMMA, DOT, MINUS, PLUS,
+    SEMICOLON, SLASH, STAR, BANG, BANG_EQUAL, EQUAL, EQUAL_EQUAL, GREATER,
+    GREATER_EQUAL, LESS, LESS_EQUAL, IDENTIFIER, STRING, NUMBER, AND, BREAK,
+    CLASS, ELSE, FALSE, FUN, FOR, IF, NIL, OR, PRINT, RETURN, SUPER, THIS,
+    TRUE, LET, WHILE, EOF,
+)
+
+SINGLE_CHARACTER_TOKENS = {
+    '(': LEFT_PAREN,
+    ')': RIGHT_PAREN,
+    '{': LEFT_BRACE,
+    '}': RIGHT_BRACE,
+    ',': COMMA,
+    '.': DOT,
+    '-': MINUS,
+    '+': PLUS,
+    ';': SEMICOLON,
+    '*': STAR,
+}
+
+# identifiers and numbers are ASCII only, set membership is cheaper than
+# the unicode aware str.isalpha/str.isdigit
+LETTERS = frozenset(string.ascii_letters)
+DIGITS = frozenset(string.digits)
+
+# the rest of an identifier or number after its first character. Matching
+# these runs in C rather than a character at a time through peek/advance
+IDENTIFIER_TAIL = re.compile(r'\w*', re.ASCII)
+NUMBER_TAIL = re.compile(r'\d*(?:\.\d+)?', re.ASCII)
+WHITESPACE_TAIL = re.compile(r'[ \r\t]*')
+
+# characters that make a different token when followed by '=', as
+# (alone, with '=') pairs of type and lexeme. Reusing the lexemes saves
+# slicing a new string out of the source for every operator
+EQUAL_SUFFIXED_TOKENS = {
+    '!': ((BANG, '!'), (BANG_EQUAL, '!=')),
+    '=': ((EQUAL, '='), (EQUAL_EQUAL, '==')),
+    '<': ((LESS, '<'), (LESS_EQUAL, '<=')),
+    '>': ((GREATER, '>'), (GREATER_EQUAL, '>=')),
+}
+
+
+# the dict is probed once per identifier with the hash interning already
+# computed, which beats narrowing candidates by first character
+KEYWORDS = {
+    'and': AND,
+    'break': BREAK,
+    'class': CLASS,
+    'else':   ELSE,
+    'false':  FALSE,
+    'for':    FOR,
+    'fun':    FUN,
+    'if':     IF,
+    'nil':    NIL,
+    'or':     OR,
+    'print':  PRINT,
+    'return': RETURN,
+    'super':  SUPER,
+    'this':   THIS,
+    'true':   TRUE,
+    'let':    LET,
+    'while':  WHILE,
+}
 
 
 class Scanner:
@@ -9,129 +75,80 @@ class Scanner:
         self.start = 0
         self.current = 0
         self.line = 1
-        self.tokens: List[Token] = []
-        self.keywords = {
-            'and': TokenType.AND,
-            'break': TokenType.BREAK,
-            'class': TokenType.CLASS,
-            'else':   TokenType.ELSE,
-            'false':  TokenType.FALSE,
-            'for':    TokenType.FOR,
-            'fun':    TokenType.FUN,
-            'if':     TokenType.IF,
-            'nil':    TokenType.NIL,
-            'or':     TokenType.OR,
-            'print':  TokenType.PRINT,
-            'return': TokenType.RETURN,
-            'super':  TokenType.SUPER,
-            'this':   TokenType.THIS,
-            'true':   TokenType.TRUE,
-            'let':    TokenType.LET,
-            'while':  TokenType.WHILE,
-        }
+        self.tokens = TokenStream()
+        # appended to directly for the most common tokens
+        self.types = self.tokens.types
+        self.lexemes = self.tokens.lexemes
+        self.lines = self.tokens.lines
 
     def scan_tokens(self):
         while not self.is_at_end():
             self.start = self.current
             self.scan_token()
 
-        self.tokens.append(Token(TokenType.EOF, '', None, self.line))
+        self.tokens.append(EOF, '', None, self.line)
 
     def scan_token(self):
         c = self.advance()
-        if c == '(':
-            self.add_token(TokenType.LEFT_PAREN, None)
-        elif c == ')':
-            self.add_token(TokenType.RIGHT_PAREN, None)
-        elif c == '{':
-            self.add_token(TokenType.LEFT_BRACE, None)
-        elif c == '}':
-            self.add_token(TokenType.RIGHT_BRACE, None)
-        elif c == ',':
-            self.add_token(TokenType.COMMA, None)
-        elif c == '.':
-            self.add_token(TokenType.DOT, None)
-        elif c == '-':
-            self.add_token(TokenType.MINUS, None)
-        elif c == '+':
-            self.add_token(TokenType.PLUS, None)
-        elif c == ';':
-            self.add_token(TokenType.SEMICOLON, None)
-        elif c == '*':
-            self.add_token(TokenType.STAR, None)
-        elif c == '!':
-            self.add_token(
-                TokenType.BANG_EQUAL if self.match(
-                    '=') else TokenType.BANG, None
-            )
-        elif c == '=':
-            self.add_token(
-                TokenType.EQUAL_EQUAL if self.match(
-                    '=') else TokenType.EQUAL, None
-            )
-        elif c == '<':
-            self.add_token(
-                TokenType.LESS_EQUAL if self.match(
-                    '=') else TokenType.LESS, None
-            )
-        elif c == '>':
-            self.add_token(
-                TokenType.GREATER_EQUAL if self.match(
-                    '=') else TokenType.GREATER, None
-            )
-        elif c == '/':
+        # most punctuation is a single character and maps straight to a type
+        type_ = SINGLE_CHARACTER_TOKENS.get(c)
+        if type_ != None:
+            self.types.append(type_)
+            self.lexemes.append(c)
+            self.lines.append(self.line)
+            return
+        pairs = EQUAL_SUFFIXED_TOKENS.get(c)
+        if pairs != None:
+            type_, lexeme = pairs[1] if self.match('=') else pairs[0]
+            self.tokens.append(type_, lexeme, None, self.line)
+            return
+
+        if c == '/':
             if self.match('/'):
                 # a comment goes until the end of the line
-                while self.peek() != '\n' and not self.is_at_end():
-                    self.advance()
+                end = self.source.find('\n', self.current)
+                self.current = len(self.source) if end == -1 else end
             else:
-                self.add_token(TokenType.SLASH, None)
-        elif c in [' ', '\r', '\t']:
-            return
+                self.add_token(SLASH, None)
+        elif c == ' ' or c == '\r' or c == '\t':
+            # indentation comes in runs, skip the rest of it in one go
+            self.current = WHITESPACE_TAIL.match(self.source, self.current).end()
         elif c == '\n':
             self.line += 1
         elif c == '"':
             self.string()
+        elif c in LETTERS:
+            self.identifier()
+        elif c in DIGITS:
+            self.number()
         else:
-            if c.isdigit():
-                self.number()
-            elif c.isalpha():
-                self.identifier()
-            else:
-                # TODO: check this is correct
-                self.hoot.report(self.line, '', 'Unexpected character.')
+            # TODO: check this is correct
+            self.hoot.report(self.line, '', 'Unexpected character.')
 
     def identifier(self):
-        while self.is_alpha_numeric(self.peek()):
-            self.advance()
+        self.current = IDENTIFIER_TAIL.match(self.source, self.current).end()
 
-        text = self.source[self.start:self.current]
-        type_ = self.keywords[text] if text in self.keywords else TokenType.IDENTIFIER
-        self.add_token(type_, None)
+        # interning first means every keyword and repeated name shares one
+        # string, and the hash it computes is cached for the keyword probe
+        text = sys.intern(self.source[self.start:self.current])
+        self.tokens.append(KEYWORDS.get(text, IDENTIFIER), text, None, self.line)
 
     def number(self):
-        while self.peek().isdigit():
-            self.advance()
-
-        # look for fractional part
-        if self.peek() == '.' and self.peek_next().isdigit():
-            # consume the "."
-            self.advance()
+        # digits with an optional fractional part
+        self.current = NUMBER_TAIL.match(self.source, self.current).end()
 
-        while self.peek().isdigit():
-            self.advance()
-
-        self.add_token(TokenType.NUMBER, float(
+        self.add_token(NUMBER, float(
             self.source[self.start:self.current]))
 
     def string(self):
-        while self.peek() != '"' and not self.is_at_end():
-            if self.peek() == '\n':
-                self.line += 1
-            self.advance()
+        end = self.source.find('"', self.current)
+        if end == -1:
+            end = len(self.source)
+        self.line += self.source.count('\n', self.current, end)
+        self.current = end
 
         if self.is_at_end():
-            self.hoot.error(Token(TokenType.EOF, None, None,
+            self.hoot.error(Token(EOF, None, None,
                                   self.line), 'Unterminated string.')
             return
 
@@ -140,7 +157,7 @@ class Scanner:
 
         # trim the surrounding quotes
         value = self.source[self.start+1: self.current-1]
-        self.add_token(TokenType.STRING, value)
+        self.add_token(STRING, value)
 
     def match(self, expected):
         if self.is_at_end():
@@ -150,32 +167,13 @@ class Scanner:
         self.current += 1
         return True
 
-    def peek(self):
-        if self.is_at_end():
-            return '\0'
-        return self.source[self.current]
-
-    def is_digit(self, c):
-        return c.isdigit()
-
-    def is_alpha(self, c):
-        return c.isalpha() or c == '_'
-
-    def is_alpha_numeric(self, c):
-        return self.is_digit(c) or self.is_alpha(c)
-
-    def peek_next(self):
-        if self.current + 1 >= len(self.source):
-            return '\0'
-        return self.source[self.current+1]
-
     def advance(self):
         self.current += 1
         return self.source[self.current-1]
 
     def add_token(self, type_, literal):
         text = self.source[self.start:self.current]
-        self.tokens.append(Token(type_, text, literal, self.line))
+        self.tokens.append(type_, text, literal, self.line)
 
     def is_at_end(self):
         return self.current >= len(self.source)
@@ -1,127 +1,91 @@
-from abc import ABCMeta, abstractmethod
 from tokens import Token
-from typing import List
+from typing import Any, List, Optional
 
 
-class StmtVisitor(metaclass=ABCMeta):
-    @abstractmethod
-    def visit_block_stmt(self, stmt): pass
-
-    @abstractmethod
-    def visit_break_stmt(self, stmt): pass
-
-    @abstractmethod
-    def visit_class_stmt(self, stmt): pass
-
-    @abstractmethod
-    def visit_expression_stmt(self, stmt): pass
-
-    @abstractmethod
-    def visit_function_stmt(self, stmt): pass
-
-    @abstractmethod
-    def visit_if_stmt(self, stmt): pass
-
-    @abstractmethod
-    def visit_print_stmt(self, stmt): pass
-
-    @abstractmethod
-    def visit_return_stmt(self, stmt): pass
-
-    @abstractmethod
-    def visit_var_stmt(self, stmt): pass
-
-    @abstractmethod
-    def visit_while_stmt(self, stmt): pass
-
-
-class Stmt(metaclass=ABCMeta):
-    @abstractmethod
-    def accept(self, visitor): pass
+class Stmt:
+    __slots__ = ()
 
 
 class Block(Stmt):
+    __slots__ = ('statements', 'block_type', '_code')
+
     def __init__(self, statements: List[Stmt], block_type=None):
         self.statements = statements
         self.block_type = block_type
-
-    def accept(self, visitor: StmtVisitor):
-        return visitor.visit_block_stmt(self)
+        # the statements paired with their handlers, built on first run
+        self._code: Optional[List] = None
 
 
 class Class(Stmt):
+    __slots__ = ('name', 'superclass', 'methods')
+
     def __init__(self, name: Token, superclass, methods: List):
         self.name = name
         self.superclass = superclass
         self.methods = methods
 
-    def accept(self, visitor: StmtVisitor):
-        return visitor.visit_class_stmt(self)
-
 
 class Expression(Stmt):
+    __slots__ = ('expression',)
+
     def __init__(self, expression):
         self.expression = expression
 
-    def accept(self, visitor: StmtVisitor):
-        return visitor.visit_expression_stmt(self)
-
 
 class Function(Stmt):
+    __slots__ = ('name', 'params', 'body', '_code', '_numeric')
+
     def __init__(self, name: Token, params: List[Token], body: List[Stmt]):
         self.name = name
         self.params = params
         self.body = body
-
-    def accept(self, visitor: StmtVisitor):
-        return visitor.visit_function_stmt(self)
+        # the body paired with its handlers, built on the first call
+        self._code: Optional[List] = None
+        # the body compiled to Python if it only works with numbers,
+        # False if it doesn't, tried on the first call
+        self._numeric: Any = None
 
 
 class If(Stmt):
+    __slots__ = ('condition', 'then_branch', 'else_branch')
+
     def __init__(self, condition, then_branch, else_branch):
         self.condition = condition
         self.then_branch = then_branch
         self.else_branch = else_branch
 
-    def accept(self, visitor: StmtVisitor):
-        return visitor.visit_if_stmt(self)
-
 
 class Print(Stmt):
+    __slots__ = ('expression',)
+
     def __init__(self, expression):
         self.expression = expression
 
-    def accept(self, visitor: StmtVisitor):
-        return visitor.visit_print_stmt(self)
-
 
 class Return(Stmt):
+    __slots__ = ('keyword', 'value')
+
     def __init__(self, keyword: Token, value):
         self.keyword = keyword
         self.value = value
 
-    def accept(self, visitor: StmtVisitor):
-        return visitor.visit_return_stmt(self)
-
 
 class Let(Stmt):
+    __slots__ = ('name', 'initializer')
+
     def __init__(self, name, initializer):
         self.name = name
         self.initializer = initializer
 
-    def accept(self, visitor: StmtVisitor):
-        return visitor.visit_var_stmt(self)
-
 
 class While(Stmt):
+    __slots__ = ('condition', 'body')
+
     def __init__(self, condition, body):
         self.condition = condition
         self.body = body
 
-    def accept(self, visitor: StmtVisitor):
-        return visitor.visit_while_stmt(self)
-
 
 class Break(Stmt):
-    def accept(self, visitor: StmtVisitor):
-        return visitor.visit_break_stmt(self)
+    __slots__ = ()
+
@@ -1,16 +1,34 @@
 from hoot import Hoot
-from os import listdir
-from os.path import isfile, join
+from os import scandir
 
-examples = [f for f in listdir("examples")  # grab all hoot files
-            if isfile(join("examples", f)) if '.hoot' in f]
+examples = sorted(entry.name for entry in scandir("examples")  # grab all hoot files
+                  if entry.is_file() and entry.name.endswith('.hoot'))
+
+# functions in numeric.hoot that should run through the NumericCompiler,
+# and ones that should fall back to the tree-walker
+numeric_compiled = ["sum_of_squares", "collatz_steps", "first_square_above",
+                    "count_until", "shadowed", "in_range", "outside", "add",
+                    "past_the_largest_float"]
+numeric_not_compiled = ["count_down"]
 
 for example in examples:
     location = f"examples/{example}"
     print(f"\nRunning {location}..")
-    exit_code = Hoot().run_file(location)
+    hoot = Hoot()
+    exit_code = hoot.run_file(location)
     if exit_code != 0:
         print(f"Error running {example} - code: {exit_code}")
         quit()
 
+    if example == "numeric.hoot":
+        functions = hoot.interpreter.globals.values
+        for name in numeric_compiled:
+            if not functions[name].declaration._numeric:
+                print(f"Error running {example} - {name} wasn't compiled")
+                quit()
+        for name in numeric_not_compiled:
+            if functions[name].declaration._numeric != False:
+                print(f"Error running {example} - {name} was compiled")
+                quit()
+
 print("\nIntegration tests passed!")
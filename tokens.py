@@ -1,7 +1,12 @@
-from enum import Enum, auto
+import sys
+from array import array
+from typing import Dict, List, Optional, Union
+from enum import Enum, IntEnum, auto
 
 
 class Token:
+    __slots__ = ('type_', 'lexeme', 'literal', 'line')
+
     def __init__(self, type_, lexeme, literal, line):
         self.type_ = type_
         self.lexeme = lexeme
@@ -9,10 +14,55 @@ class Token:
         self.line = line
 
     def __repr__(self):
-        return f"{self.type_} {self.lexeme} {self.literal}"
+        return f"{TOKEN_NAMES[self.type_]} {self.lexeme} {self.literal}"
+
+    def __reduce__(self):
+        # pickling loses the interning the scanner did, so cached tokens
+        # are rebuilt through load_token
+        return (load_token, (self.type_, self.lexeme, self.literal, self.line))
+
+
+class TokenStream:
+    """The scanner's output stored column by column. The parser mostly
+    looks at types, so a Token is only made when one is indexed."""
+    __slots__ = ('types', 'lexemes', 'literals', 'lines')
+
+    def __init__(self):
+        self.types: List[TokenType] = []
+        self.lexemes: List[Optional[str]] = []
+        # only numbers and strings have a literal, so they are kept by
+        # token index instead of a None for every other token
+        self.literals: Dict[int, Union[float, str]] = {}
+        # lines are only read when a Token is made, so they are packed as
+        # machine ints rather than a list of references
+        self.lines = array('i')
+
+    def append(self, type_, lexeme, literal, line):
+        if literal is not None:
+            self.literals[len(self.types)] = literal
+        self.types.append(type_)
+        self.lexemes.append(lexeme)
+        self.lines.append(line)
+
+    def __getitem__(self, index: int):
+        return Token(self.types[index], self.lexemes[index],
+                     self.literals.get(index), self.lines[index])
 
+    def __len__(self):
+        return len(self.types)
+
+
+def load_token(type_, lexeme, literal, line):
+    if type_ == TokenType.IDENTIFIER:
+        lexeme = sys.intern(lexeme)
+    return Token(type_, lexeme, literal, line)
+
+
+class TokenType(IntEnum):
+    # an IntEnum hashes and compares as an int, which matters for the
+    # parser's lookups keyed by type. Printing keeps the enum's name
+    __str__ = Enum.__str__
 
-class TokenType(Enum):
     # single-character tokens
     LEFT_PAREN = auto()
     RIGHT_PAREN = auto()
@@ -61,3 +111,52 @@ class TokenType(Enum):
     WHILE = auto()
 
     EOF = auto()
+
+
+# every member as a plain module global. Reading TokenType.X goes through
+# the enum's attribute lookup, which is slow enough to show up in the
+# scanner and parser
+LEFT_PAREN = TokenType.LEFT_PAREN
+RIGHT_PAREN = TokenType.RIGHT_PAREN
+LEFT_BRACE = TokenType.LEFT_BRACE
+RIGHT_BRACE = TokenType.RIGHT_BRACE
+COMMA = TokenType.COMMA
+DOT = TokenType.DOT
+MINUS = TokenType.MINUS
+PLUS = TokenType.PLUS
+SEMICOLON = TokenType.SEMICOLON
+SLASH = TokenType.SLASH
+STAR = TokenType.STAR
+BANG = TokenType.BANG
+BANG_EQUAL = TokenType.BANG_EQUAL
+EQUAL = TokenType.EQUAL
+EQUAL_EQUAL = TokenType.EQUAL_EQUAL
+GREATER = TokenType.GREATER
+GREATER_EQUAL = TokenType.GREATER_EQUAL
+LESS = TokenType.LESS
+LESS_EQUAL = TokenType.LESS_EQUAL
+IDENTIFIER = TokenType.IDENTIFIER
+STRING = TokenType.STRING
+NUMBER = TokenType.NUMBER
+AND = TokenType.AND
+BREAK = TokenType.BREAK
+CLASS = TokenType.CLASS
+ELSE = TokenType.ELSE
+FALSE = TokenType.FALSE
+FUN = TokenType.FUN
+FOR = TokenType.FOR
+IF = TokenType.IF
+NIL = TokenType.NIL
+OR = TokenType.OR
+PRINT = TokenType.PRINT
+RETURN = TokenType.RETURN
+SUPER = TokenType.SUPER
+THIS = TokenType.THIS
+TRUE = TokenType.TRUE
+LET = TokenType.LET
+WHILE = TokenType.WHILE
+EOF = TokenType.EOF
+
+# names indexed by type value, auto() numbers from 1. Formatting a token
+# reads a tuple instead of going through the enum's __str__
+TOKEN_NAMES = ('',) + tuple(f'TokenType.{type_.name}' for type_ in TokenType)